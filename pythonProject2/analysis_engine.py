@@ -7,12 +7,31 @@ import warnings
 import logging
 import time
 import os
+import itertools
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from data_client import DataClient
+from strategies import (DEFAULT_SCORE_WEIGHTS, build_leg_pools, describe_combinations, enumerate_combinations,
+                        get_strategy, merge_combination_order, prefilter_chain, rank_candidates, ranking_state,
+                        top_per_expiration, update_combinations)
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 warnings.filterwarnings('ignore')
 
+# Multiplier for the courtesy pauses between upstream calls. Offline tools that
+# talk to a local fake data source (e.g. loadtest.py) set it to 0.
+UPSTREAM_DELAY_SCALE = float(os.environ.get('VEGAEDGE_UPSTREAM_DELAY_SCALE', '1.0'))
+
+
+def gentle_delay(seconds):
+    if UPSTREAM_DELAY_SCALE > 0:
+        time.sleep(seconds * UPSTREAM_DELAY_SCALE)
+
 
 # -------------------------------
 # Black-Scholes and Data Functions
@@ -38,217 +57,784 @@ def bs_delta(S, K, T, r, sigma, option_type='call', q=0.0):
     return np.exp(-q * T) * norm.cdf(D1) if option_type == 'call' else np.exp(-q * T) * (norm.cdf(D1) - 1)
 
 
-def get_options_data(ticker, expiration, underlying_price):
+def _d1_array(S, K, T, r, sigma, q=0.0):
+    # float_power goes through libm pow like the scalar `sigma ** 2`; numpy's array
+    # `** 2` squares by multiplication, which can differ in the last bit.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        D1 = (np.log(S / K) + (r - q + 0.5 * np.float_power(sigma, 2)) * T) / (sigma * np.sqrt(T))
+    return np.where((T > 0) & (sigma > 0), D1, np.where(S > K, np.inf, -np.inf))
+
+
+def bs_vega_array(S, K, T, r, sigma, q=0.0):
+    """Vectorized bs_vega: S, K, T and sigma may be scalars or broadcastable arrays."""
+    S, K, T, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, sigma)))
+    with np.errstate(invalid='ignore'):
+        vega = S * np.exp(-q * T) * norm.pdf(_d1_array(S, K, T, r, sigma, q)) * np.sqrt(T) / 100
+    return np.where((T > 0) & (sigma > 0), vega, 0.0)
+
+
+def bs_delta_array(S, K, T, r, sigma, option_type='call', q=0.0):
+    """Vectorized bs_delta with the same expiry conventions as the scalar version."""
+    S, K, T, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, sigma)))
+    D1 = _d1_array(S, K, T, r, sigma, q)
+    if option_type == 'call':
+        delta = np.exp(-q * T) * norm.cdf(D1)
+        expired = np.where(S > K, 1.0, 0.0)
+    else:
+        delta = np.exp(-q * T) * (norm.cdf(D1) - 1)
+        expired = np.where(S < K, -1.0, 0.0)
+    return np.where(T > 0, delta, expired)
+
+
+def clean_option_chain(input_df, underlying_price, expiration, criteria=None):
+    """Drop illiquid or unquoted contracts and tag the rest with moneyness and expiration."""
+    if input_df is None or input_df.empty: return pd.DataFrame()
+    criteria = resolve_criteria(None, criteria)
+    df = input_df.copy()
+    df.dropna(subset=['impliedVolatility', 'bid', 'ask'], inplace=True)
+    if df.empty: return pd.DataFrame()
+    mask = (((df['volume'] > 0) | (df['openInterest'] > 0)) & (df['impliedVolatility'] > 0.01) &
+            (df['bid'] > criteria['min_bid']) & ((df['ask'] - df['bid']) / df['ask'] < criteria['max_spread_pct']))
+    filtered_df = df[mask].copy()
+    if not filtered_df.empty:
+        filtered_df['moneyness'] = filtered_df['strike'] / underlying_price
+        filtered_df['expiration'] = expiration
+    return filtered_df
+
+
+def get_options_data(ticker, expiration, underlying_price, criteria=None):
     try:
-        stock = yf.Ticker(ticker)
-        opt_chain = stock.option_chain(expiration)
+        raw_calls, raw_puts = fetch_option_chain(ticker, expiration)
     except Exception as e:
         return pd.DataFrame(), pd.DataFrame()
 
-    def process_df(input_df):
-        if input_df is None or input_df.empty: return pd.DataFrame()
-        df = input_df.copy()
-        df.dropna(subset=['impliedVolatility', 'bid', 'ask'], inplace=True)
-        if df.empty: return pd.DataFrame()
-        mask = (((df['volume'] > 0) | (df['openInterest'] > 0)) & (df['impliedVolatility'] > 0.01) & (df['bid'] > 0) & (
-                    (df['ask'] - df['bid']) / df['ask'] < 0.6))
-        filtered_df = df[mask].copy()
-        if not filtered_df.empty:
-            filtered_df['moneyness'] = filtered_df['strike'] / underlying_price
-            filtered_df['expiration'] = expiration
-        return filtered_df
-
-    calls = process_df(opt_chain.calls)
-    puts = process_df(opt_chain.puts)
-
-    # Add a small delay to be respectful to the API
-    time.sleep(0.2)
-
+    calls = clean_option_chain(raw_calls, underlying_price, expiration, criteria)
+    puts = clean_option_chain(raw_puts, underlying_price, expiration, criteria)
     return calls, puts
 
 
+# -------------------------------
+# Upstream Data Cache
+# -------------------------------
+# Quotes, expiration lists and raw option chains are shared between requests for a short
+# while, so repeat analyses of a ticker skip the slow Yahoo Finance round trips.
+# Cleaning and Greeks always run on copies, so cached frames are never modified.
+QUOTE_CACHE_TTL = 60  # seconds
+EXPIRATIONS_CACHE_TTL = 30 * 60
+CHAIN_CACHE_TTL = 5 * 60
+UPSTREAM_CACHE_SIZE = 512
+
+_upstream_cache = OrderedDict()
+_upstream_cache_lock = threading.Lock()
+
+# One pooled session and a cache of Ticker handles for all upstream calls (see data_client.py)
+data_client = DataClient(yf)
+
+
+def _cached_fetch(key, ttl, fetch, refresh=False):
+    """Return the cached value for `key`, calling `fetch` when missing, expired or `refresh` is set."""
+    now = time.time()
+    if not refresh:
+        with _upstream_cache_lock:
+            entry = _upstream_cache.get(key)
+            if entry is not None and entry['expires_at'] > now:
+                _upstream_cache.move_to_end(key)
+                return entry['value']
+    value = fetch()
+    if value is not None:
+        with _upstream_cache_lock:
+            _upstream_cache[key] = {'value': value, 'expires_at': time.time() + ttl}
+            _upstream_cache.move_to_end(key)
+            while len(_upstream_cache) > UPSTREAM_CACHE_SIZE:
+                _upstream_cache.popitem(last=False)
+    return value
+
+
+def cache_time_left(key):
+    """Seconds until the cached entry for `key` expires, or None when it is not cached."""
+    with _upstream_cache_lock:
+        entry = _upstream_cache.get(key)
+    return None if entry is None else entry['expires_at'] - time.time()
+
+
+def peek_cached(key):
+    """The cached value for `key` if it is still fresh, without fetching anything."""
+    with _upstream_cache_lock:
+        entry = _upstream_cache.get(key)
+    return entry['value'] if entry is not None and entry['expires_at'] > time.time() else None
+
+
+def analysis_is_cached(ticker, min_dte, max_dte):
+    """Whether an analysis of `ticker` would be served entirely from the upstream cache."""
+    ticker = ticker.upper()
+    expirations = peek_cached(('expirations', ticker))
+    if peek_cached(('quote', ticker)) is None or not expirations:
+        return False
+    return all(peek_cached(('chain', ticker, expiration)) is not None
+               for expiration in select_expirations(expirations, min_dte, max_dte))
+
+
+def cached_inputs(ticker, min_dte, max_dte, strategy_type):
+    """
+    (valuation date, quote, expirations, chains...) an analysis of `ticker` would read from
+    the upstream cache, or None when any of them would be fetched. Cached values are never
+    modified, so inputs that are the same objects as before give the same analysis.
+    """
+    ticker = ticker.upper()
+    quote, expirations = peek_cached(('quote', ticker)), peek_cached(('expirations', ticker))
+    if quote is None or not expirations:
+        return None
+    limit = DIAGONAL_MAX_EXPIRATIONS if get_strategy(strategy_type).get('cross_expiration') else 3
+    chains = [peek_cached(('chain', ticker, expiration))
+              for expiration in select_expirations(expirations, min_dte, max_dte, limit)]
+    if any(chain is None for chain in chains):
+        return None
+    return (datetime.now().date(), quote, expirations, *chains)
+
+
+def same_inputs(inputs, previous):
+    """Whether two cached_inputs() results are the same date and cached objects."""
+    return (inputs is not None and previous is not None and len(inputs) == len(previous) and
+            inputs[0] == previous[0] and all(a is b for a, b in zip(inputs[1:], previous[1:])))
+
+
+def fetch_underlying_price(ticker, refresh=False):
+    """Last close of `ticker`, or None when Yahoo Finance has no price data for it."""
+    def fetch():
+        history_data = data_client.ticker(ticker).history(period='1d')
+        if history_data.empty:
+            return None
+        gentle_delay(0.4)
+        return history_data['Close'].iloc[-1]
+    return _cached_fetch(('quote', ticker.upper()), QUOTE_CACHE_TTL, fetch, refresh)
+
+
+def fetch_expirations(ticker, refresh=False):
+    def fetch():
+        # A new handle, so the expiration list is read again rather than taken from the old one
+        expirations = tuple(data_client.ticker(ticker, fresh=True).options or ())
+        gentle_delay(0.4)
+        return expirations or None
+    return _cached_fetch(('expirations', ticker.upper()), EXPIRATIONS_CACHE_TTL, fetch, refresh)
+
+
+def fetch_option_chain(ticker, expiration, refresh=False):
+    """Raw (calls, puts) frames for one expiration, as returned by Yahoo Finance."""
+    def fetch():
+        gentle_delay(0.4)
+        opt_chain = data_client.ticker(ticker).option_chain(expiration)
+        # Add a small delay to be respectful to the API
+        gentle_delay(0.2)
+        return opt_chain.calls, opt_chain.puts
+    return _cached_fetch(('chain', ticker.upper(), expiration), CHAIN_CACHE_TTL, fetch, refresh)
+
+
+def select_expirations(expirations, min_dte, max_dte, limit=3):
+    """The first `limit` expirations whose days to expiry fall within [min_dte, max_dte]."""
+    today = datetime.now()
+    valid = [exp for exp in expirations if min_dte <= (datetime.strptime(exp, "%Y-%m-%d") - today).days <= max_dte]
+    return valid[:limit]
+
+
+# -------------------------------
+# Screening Criteria
+# -------------------------------
+# Defaults reproduce the original hard-coded screening rules. Strategies layer their own
+# defaults on top (see strategies.STRATEGIES), e.g. bullish risk reversals need
+# net_vega > 0 and bearish ones net_vega <= 0.01.
+DEFAULT_CRITERIA = {
+    'max_strike_distance_pct': 0.75,  # strike window around the underlying, as a fraction of its price
+    'max_net_cost': 20.0,  # abs(net_cost) limit per share
+    'min_abs_net_delta': 0.1,  # net delta must exceed this in the strategy's direction
+    'min_net_vega': None,  # net_vega must be strictly above this
+    'max_net_vega': None,  # net_vega must be at or below this
+    'min_bid': 0.0,  # every leg's bid must be strictly above this
+    'max_spread_pct': 0.6,  # every leg's (ask - bid) / ask must be below this
+}
+
+
+def resolve_criteria(strategy_type, criteria=None):
+    """Fill the unset (None or missing) entries of `criteria` with the defaults for `strategy_type`."""
+    resolved = dict(DEFAULT_CRITERIA)
+    if strategy_type is not None:
+        resolved.update(get_strategy(strategy_type)['criteria'])
+    if criteria:
+        resolved.update({key: value for key, value in criteria.items() if value is not None})
+    return resolved
+
+
+def select_strike_window(calls, puts, underlying_price, criteria):
+    """Calls and puts whose strikes lie within the configured distance of the underlying price."""
+    max_strike_distance = underlying_price * criteria['max_strike_distance_pct']
+    lower, upper = underlying_price - max_strike_distance, underlying_price + max_strike_distance
+    return tuple(df if df.empty else df[(df['strike'] > lower) & (df['strike'] < upper)] for df in (calls, puts))
+
+
+def _missing_leg_data(strategy, calls, puts):
+    chains = {'call': calls, 'put': puts}
+    return any(chains[leg['type']].empty for leg in strategy['legs'])
+
+
+def add_greeks(df, option_type, underlying_price, T, risk_free_rate=0.045, dividend_yield=0.0):
+    if df.empty: return
+    df['vega'] = bs_vega_array(underlying_price, df['strike'], T, risk_free_rate, df['impliedVolatility'],
+                               dividend_yield)
+    df['delta'] = bs_delta_array(underlying_price, df['strike'], T, risk_free_rate, df['impliedVolatility'],
+                                 option_type, dividend_yield)
+
+
+# Expirations searched by cross-expiration (diagonal) strategies
+DIAGONAL_MAX_EXPIRATIONS = 6
+
+
+# -------------------------------
+# Per-Request Stage and Memory Accounting
+# -------------------------------
+# How many times the strike window may be halved to fit a memory budget before giving up
+MAX_DEGRADE_STEPS = 4
+# Ranking copies and sorts the candidate frame, so budget for a few copies of it
+RANK_MEMORY_FACTOR = 3
+# Candidate rows sampled to estimate the per-row cost of the describe frame
+ROW_SIZE_SAMPLE = 256
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when an analysis cannot stay within its memory budget."""
+
+
+class AnalysisCancelled(Exception):
+    """Raised at the next stage boundary once a tracker's cancel event is set."""
+
+
+class StageTracker:
+    """
+    Wall time per pipeline stage for one analysis and, when `track_memory` is set, the peak
+    traced allocation (tracemalloc) of each stage. tracemalloc is process-wide: the peaks are
+    only this analysis's own when nothing else runs in the process, which is what
+    run_isolated_analysis is for. Stages after close() are timed but not traced.
+
+    `memory_budget_mb` caps the estimated size of the candidate frames. Over budget, the
+    strike window is narrowed (`degrade=True`) or MemoryBudgetExceeded is raised.
+
+    `cancel_event` (a threading.Event) makes the analysis stop cooperatively: every stage
+    and progress step checks it and raises AnalysisCancelled once it is set. `on_progress`
+    is called as on_progress(stage, message, fraction) as the analysis moves along.
+    """
+
+    def __init__(self, track_memory=False, memory_budget_mb=None, degrade=True, cancel_event=None,
+                 on_progress=None):
+        self.track_memory = track_memory
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self.memory_budget_mb = memory_budget_mb
+        self.degrade = degrade
+        self.stages = {}
+        self.degraded = []
+        self.aborted = None
+        self.held_bytes = 0
+        self.peak_bytes = 0
+        self.started = time.perf_counter()
+        self.finished = None
+        self.cancel_event = cancel_event
+        self.on_progress = on_progress
+        self._baseline = 0
+        if track_memory:
+            _start_tracemalloc()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise AnalysisCancelled("analysis cancelled")
+
+    def progress(self, stage, message, fraction):
+        """Report progress (fraction in [0, 1]); also a cancellation point."""
+        self.check_cancelled()
+        if self.on_progress is not None:
+            self.on_progress(stage, message, fraction)
+
+    @contextmanager
+    def stage(self, name):
+        self.check_cancelled()
+        entry = self.stages.setdefault(name, {'ms': 0.0, 'calls': 0})
+        tracing = self.track_memory and self.finished is None
+        if tracing:
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            # Python 3.8 has no reset_peak; the stage's peak is then the peak so far
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry['ms'] += (time.perf_counter() - started) * 1000
+            entry['calls'] += 1
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                entry['peak_mb'] = max(entry.get('peak_mb', 0.0), (peak - start_bytes) / 1024 / 1024)
+                self.peak_bytes = max(self.peak_bytes, peak - self._baseline)
+        if tracing and self.memory_budget and self.peak_bytes > self.memory_budget:
+            raise MemoryBudgetExceeded(f"peak memory {self.peak_bytes / 1024 / 1024:.1f} MB exceeded the "
+                                       f"{self.memory_budget_mb:g} MB budget during '{name}'")
+
+    def fits(self, estimated_bytes):
+        """Whether `estimated_bytes` more can be held without going over the budget."""
+        return self.memory_budget is None or \
+            (self.held_bytes + estimated_bytes) * RANK_MEMORY_FACTOR <= self.memory_budget
+
+    def reserve(self, estimated_bytes):
+        self.held_bytes += estimated_bytes
+
+    def close(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+            if self.track_memory:
+                _stop_tracemalloc()
+
+    def report(self):
+        """The timings block returned by the API."""
+        self.close()
+        timings = {
+            'total_ms': round((self.finished - self.started) * 1000, 1),
+            'stages': {name: {key: round(value, 3) if isinstance(value, float) else value
+                              for key, value in entry.items()} for name, entry in self.stages.items()},
+        }
+        if self.track_memory or self.memory_budget:
+            timings['memory'] = {
+                'tracked': self.track_memory,
+                'peak_mb': round(self.peak_bytes / 1024 / 1024, 3) if self.track_memory else None,
+                'estimated_candidates_mb': round(self.held_bytes / 1024 / 1024, 3),
+                'budget_mb': self.memory_budget_mb,
+                'degraded': self.degraded,
+                'aborted': self.aborted,
+            }
+        return timings
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def run_isolated_analysis(ticker, min_dte, max_dte, strategy_type, criteria=None, memory_budget_mb=None,
+                          degrade=True):
+    """
+    run_ranked_analysis with memory tracking, for a worker process that runs one analysis at
+    a time, so the traced peaks are this analysis's alone. Returns (report_text,
+    ranked_results, tracker) with the tracker closed, ready to be sent back to the caller.
+    """
+    tracker = StageTracker(track_memory=True, memory_budget_mb=memory_budget_mb, degrade=degrade)
+    try:
+        report, ranked_results = run_ranked_analysis(ticker, min_dte, max_dte, strategy_type, criteria, tracker)
+    finally:
+        tracker.close()
+    return report, ranked_results, tracker
+
+
+def estimate_candidate_bytes(strategy, pools, indices, totals):
+    """Size of the describe frame for `indices`, extrapolated from a small sample of rows."""
+    if len(indices) == 0:
+        return 0
+    sample = indices[:ROW_SIZE_SAMPLE]
+    sample_totals = {key: values[:ROW_SIZE_SAMPLE] for key, values in totals.items()}
+    frame = pd.DataFrame(describe_combinations(strategy, pools, sample, sample_totals))
+    return int(frame.memory_usage(deep=True).sum() / len(sample) * len(indices))
+
+
+# -------------------------------
+# Incremental Re-ranking
+# -------------------------------
+# A refresh usually changes a handful of quotes in one expiration. The last evaluation of
+# each (ticker, strategy, expiration) is kept, so re-analyzing a refreshed chain with the
+# same price and valuation date only recomputes Greeks for contracts whose IV changed, only
+# enumerates and describes combinations with a changed leg, and only rescores the rows the
+# ranking requires. The results are identical to a full recompute.
+#
+# Every Greek depends on the underlying price, so a snapshot only applies when the price
+# is unchanged. During regular trading hours the price usually moves between chain
+# refreshes and the analysis recomputes in full; the savings come outside those hours and
+# on quiet underlyings. A snapshot keeps the candidate columns alive (it shares them with
+# the candidate frame), so the cache is capped in bytes, and under a memory budget what a
+# snapshot adds on top of the candidates counts against it.
+#
+# Snapshots of a large Iron Condor chain run past 100 MB, so keeping them is opt-in: set
+# VEGAEDGE_SNAPSHOT_CACHE_MB to the memory each process may spend on them. Until then,
+# or with VEGAEDGE_INCREMENTAL=0, every analysis recomputes from scratch.
+INCREMENTAL_RANKING = os.environ.get('VEGAEDGE_INCREMENTAL', '1') != '0'
+SNAPSHOT_CACHE_SIZE = 64
+SNAPSHOT_CACHE_BYTES = float(os.environ.get('VEGAEDGE_SNAPSHOT_CACHE_MB', '0')) * 1024 * 1024
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+_snapshot_versions = itertools.count(1)
+_snapshot_bytes = 0
+
+
+def _nbytes(value):
+    """Bytes held by the arrays and frames in `value` (object columns count their pointers only)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+def _get_snapshot(key, context=None):
+    """The snapshot stored under `key` if it was taken in the same `context`, else None."""
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            return None
+        _snapshots.move_to_end(key)
+    return snapshot if snapshot['context'] == context else None
+
+
+def _put_snapshot(key, snapshot, context=None, nbytes=None):
+    """
+    Store `snapshot` (never modified afterwards) under `key`; returns its version number,
+    or None when it is larger than the whole cache.
+    """
+    global _snapshot_bytes
+    snapshot['context'] = context
+    snapshot['version'] = next(_snapshot_versions)
+    snapshot['nbytes'] = _nbytes(snapshot) if nbytes is None else nbytes
+    with _snapshots_lock:
+        replaced = _snapshots.pop(key, None)
+        if replaced is not None:
+            _snapshot_bytes -= replaced['nbytes']
+        if snapshot['nbytes'] > SNAPSHOT_CACHE_BYTES:
+            return None
+        _snapshots[key] = snapshot
+        _snapshot_bytes += snapshot['nbytes']
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE or _snapshot_bytes > SNAPSHOT_CACHE_BYTES:
+            _, evicted = _snapshots.popitem(last=False)
+            _snapshot_bytes -= evicted['nbytes']
+    return snapshot['version']
+
+
+def _keep_snapshot(key, snapshot, context, tracker, shared_bytes=0):
+    """
+    _put_snapshot, counting the snapshot against the tracker's memory budget except for
+    `shared_bytes` already counted (shared with the candidates); None when it doesn't fit.
+    """
+    nbytes = _nbytes(snapshot)
+    if not tracker.fits(nbytes - shared_bytes):
+        _drop_snapshot(key)
+        return None
+    tracker.reserve(nbytes - shared_bytes)
+    return _put_snapshot(key, snapshot, context, nbytes)
+
+
+def _drop_snapshot(key):
+    global _snapshot_bytes
+    with _snapshots_lock:
+        dropped = _snapshots.pop(key, None)
+        if dropped is not None:
+            _snapshot_bytes -= dropped['nbytes']
+
+
+def clear_snapshots():
+    global _snapshot_bytes
+    with _snapshots_lock:
+        _snapshots.clear()
+        _snapshot_bytes = 0
+
+
+def snapshot_cache_stats():
+    with _snapshots_lock:
+        return {'entries': len(_snapshots), 'mb': round(_snapshot_bytes / 1024 / 1024, 1),
+                'max_mb': round(SNAPSHOT_CACHE_BYTES / 1024 / 1024, 1)}
+
+
+def add_greeks_reusing(df, previous, option_type, underlying_price, T, risk_free_rate=0.045, dividend_yield=0.0):
+    """
+    add_greeks, copying delta and vega from `previous` (the same chain prepared earlier with
+    the same price, T and rates) for the contracts whose strike and IV are unchanged.
+    """
+    if df.empty: return
+    if previous is None or previous.empty or not previous['strike'].is_unique:
+        add_greeks(df, option_type, underlying_price, T, risk_free_rate, dividend_yield)
+        return
+    position = pd.Index(previous['strike']).get_indexer(df['strike'])
+    reuse = position >= 0
+    reuse[reuse] = previous['impliedVolatility'].to_numpy()[position[reuse]] == \
+        df['impliedVolatility'].to_numpy()[reuse]
+    vega, delta = np.empty(len(df)), np.empty(len(df))
+    vega[reuse] = previous['vega'].to_numpy()[position[reuse]]
+    delta[reuse] = previous['delta'].to_numpy()[position[reuse]]
+    changed = ~reuse
+    if changed.any():
+        strikes, iv = df['strike'].to_numpy()[changed], df['impliedVolatility'].to_numpy()[changed]
+        vega[changed] = bs_vega_array(underlying_price, strikes, T, risk_free_rate, iv, dividend_yield)
+        delta[changed] = bs_delta_array(underlying_price, strikes, T, risk_free_rate, iv, option_type,
+                                        dividend_yield)
+    df['vega'] = vega
+    df['delta'] = delta
+
+
+def _previous_ranking(key, frames):
+    """
+    rank_candidates' `previous` and `reused` for ranking the concatenated `frames`, or
+    (None, None). Per candidate frame: (expiration, rows, previous_version, version, reused)
+    as returned by _evaluate_expiration.
+    """
+    previous = _get_snapshot(key)
+    if previous is None:
+        return None, None
+    reused = []
+    for expiration, rows, previous_version, _, frame_reused in frames:
+        version, offset = previous['frames'].get(expiration, (None, 0))
+        if frame_reused is None or previous_version is None or version != previous_version:
+            reused.append(np.full(rows, -1))
+        else:
+            reused.append(np.where(frame_reused >= 0, frame_reused + offset, -1))
+    reused = np.concatenate(reused)
+    if not (reused >= 0).any():
+        return None, None
+    return previous['state'], reused
+
+
+def _store_ranking(key, ranked, strategy, frames, tracker):
+    """Keep what the next _previous_ranking(key, ...) needs from this ranking."""
+    offsets, offset = {}, 0
+    for expiration, rows, _, version, _ in frames:
+        offsets[expiration] = (version, offset)
+        offset += rows
+    _keep_snapshot(key, {'state': ranking_state(ranked, strategy), 'frames': offsets}, None, tracker)
+
+
 # -------------------------------
 # Smarter Strategy Engine
 # -------------------------------
-def analyze_bullish_risk_reversal(calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
-                                  dividend_yield=0.0):
-    today = pd.to_datetime(datetime.now().date())
-    exp_date = pd.to_datetime(expiration_date)
-    T = max((exp_date - today).days / 365.0, 1 / (365 * 24))
-    days_to_exp = (exp_date - today).days
+def _enumerate_within_budget(strategy, calls, puts, underlying_price, criteria, tracker, label):
+    """enumerate_combinations, narrowing the strike window while the result would not fit the tracker's budget."""
+    pools = build_leg_pools(strategy, calls, puts, underlying_price)
+    indices, totals = enumerate_combinations(strategy, pools, criteria)
+    estimated_bytes = estimate_candidate_bytes(strategy, pools, indices, totals)
 
-    for df, option_type in [(calls, 'call'), (puts, 'put')]:
-        if df.empty: continue
-        df['vega'] = df.apply(
-            lambda row: bs_vega(underlying_price, row['strike'], T, risk_free_rate, row['impliedVolatility'],
-                                dividend_yield), axis=1)
-        df['delta'] = df.apply(
-            lambda row: bs_delta(underlying_price, row['strike'], T, risk_free_rate, row['impliedVolatility'],
-                                 option_type, dividend_yield), axis=1)
-
-    otm_calls = calls[calls['strike'] > underlying_price].copy()
-    otm_puts = puts[puts['strike'] < underlying_price].copy()
-
-    max_strike_distance = underlying_price * 0.75
-    otm_calls = otm_calls[otm_calls['strike'] < underlying_price + max_strike_distance]
-    otm_puts = otm_puts[otm_puts['strike'] > underlying_price - max_strike_distance]
-
-    if otm_calls.empty or otm_puts.empty:
-        return []
-
-    combinations = []
-    for _, call in otm_calls.iterrows():
-        for _, put in otm_puts.iterrows():
-            if call['strike'] <= put['strike']: continue
-            combo = create_bullish_strategy_combination(call, put)
-            if combo and is_valid_bullish_combo(combo):
-                combo.update({'strategy_type': 'Bullish Risk Reversal', 'expiration': expiration_date,
-                              'days_to_exp': days_to_exp})
-                combinations.append(combo)
-    return combinations
+    # Over the memory budget: halve the strike window (fewer, nearer-the-money combinations)
+    # rather than materializing a frame that could get the worker killed.
+    for _ in range(MAX_DEGRADE_STEPS):
+        if tracker.fits(estimated_bytes) or not tracker.degrade:
+            break
+        criteria = dict(criteria, max_strike_distance_pct=criteria['max_strike_distance_pct'] / 2)
+        tracker.degraded.append({'expiration': label, 'rows_before': len(indices),
+                                 'max_strike_distance_pct': criteria['max_strike_distance_pct']})
+        calls, puts = select_strike_window(calls, puts, underlying_price, criteria)
+        pools = build_leg_pools(strategy, calls, puts, underlying_price)
+        indices, totals = enumerate_combinations(strategy, pools, criteria)
+        estimated_bytes = estimate_candidate_bytes(strategy, pools, indices, totals)
+    if not tracker.fits(estimated_bytes):
+        needed_mb = (tracker.held_bytes + estimated_bytes) * RANK_MEMORY_FACTOR / 1024 / 1024
+        raise MemoryBudgetExceeded(f"{len(indices)} more candidates for {label} bring the analysis "
+                                   f"to about {needed_mb:.1f} MB, over the "
+                                   f"{tracker.memory_budget_mb:g} MB budget")
+    tracker.reserve(estimated_bytes)
+    return pools, indices, totals
 
 
-def analyze_bearish_risk_reversal(calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
-                                  dividend_yield=0.0):
-    today = pd.to_datetime(datetime.now().date())
+def evaluate_strategy(strategy_type, calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
+                      dividend_yield=0.0, criteria=None, as_of=None, tracker=None, snapshot_key=None):
+    """
+    Every valid combination of `strategy_type` for one expiration, as a DataFrame.
+    `as_of` sets the valuation date (defaults to today), which backtests use to replay history.
+    `tracker` (a StageTracker) records the stages and enforces its memory budget.
+    `snapshot_key` keeps this evaluation, so the next one under the same key only redoes what
+    the refreshed chain changed (see Incremental Re-ranking).
+    """
+    return _evaluate_expiration(strategy_type, calls, puts, underlying_price, expiration_date, risk_free_rate,
+                                dividend_yield, criteria, as_of, tracker, snapshot_key)[0]
+
+
+def _candidate_frame(strategy, columns, expiration_date, days_to_exp):
+    candidates = pd.DataFrame(columns)
+    candidates['strategy_type'] = strategy['name']
+    candidates['expiration'] = expiration_date
+    candidates['days_to_exp'] = days_to_exp
+    return candidates
+
+
+def _evaluate_expiration(strategy_type, calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
+                         dividend_yield=0.0, criteria=None, as_of=None, tracker=None, snapshot_key=None):
+    """
+    evaluate_strategy, returning (candidates, previous_version, version, reused): the versions
+    of the snapshot diffed against and of the one stored (None without a snapshot), and per
+    candidate row its row in the previous snapshot's candidates or -1 (None without one).
+    """
+    tracker = tracker or StageTracker()
+    strategy = get_strategy(strategy_type)
+    if _missing_leg_data(strategy, calls, puts):
+        return pd.DataFrame(), None, None, None
+    criteria = resolve_criteria(strategy_type, criteria)
+    today = pd.Timestamp(as_of).normalize() if as_of is not None else pd.to_datetime(datetime.now().date())
     exp_date = pd.to_datetime(expiration_date)
     T = max((exp_date - today).days / 365.0, 1 / (365 * 24))
     days_to_exp = (exp_date - today).days
 
-    for df, option_type in [(calls, 'call'), (puts, 'put')]:
-        if df.empty: continue
-        df['vega'] = df.apply(
-            lambda row: bs_vega(underlying_price, row['strike'], T, risk_free_rate, row['impliedVolatility'],
-                                dividend_yield), axis=1)
-        df['delta'] = df.apply(
-            lambda row: bs_delta(underlying_price, row['strike'], T, risk_free_rate, row['impliedVolatility'],
-                                 option_type, dividend_yield), axis=1)
-
-    otm_calls = calls[calls['strike'] > underlying_price].copy()
-    otm_puts = puts[puts['strike'] < underlying_price].copy()
-
-    max_strike_distance = underlying_price * 0.75
-    otm_calls = otm_calls[otm_calls['strike'] < underlying_price + max_strike_distance]
-    otm_puts = otm_puts[otm_puts['strike'] > underlying_price - max_strike_distance]
-
-    if otm_calls.empty or otm_puts.empty:
-        return []
-
-    combinations = []
-    for _, put in otm_puts.iterrows():
-        for _, call in otm_calls.iterrows():
-            if put['strike'] >= call['strike']: continue
-            combo = create_bearish_strategy_combination(put, call)
-            if combo and is_valid_bearish_combo(combo):
-                combo.update({'strategy_type': 'Bearish Risk Reversal', 'expiration': expiration_date,
-                              'days_to_exp': days_to_exp})
-                combinations.append(combo)
-    return combinations
-
-
-def create_bullish_strategy_combination(call_row, put_row):
-    try:
-        net_cost = call_row['ask'] - put_row['bid']
-        strike_diff = call_row['strike'] - put_row['strike']
-        efficiency = -net_cost / strike_diff if strike_diff > 0 else 0
-        
-        # Add detailed logging for debugging
-        logging.info(f"Bullish Risk Reversal Calculation:")
-        logging.info(f"  Long Call: Strike=${call_row['strike']:.2f}, Ask=${call_row['ask']:.2f}, Bid=${call_row['bid']:.2f}")
-        logging.info(f"  Short Put: Strike=${put_row['strike']:.2f}, Ask=${put_row['ask']:.2f}, Bid=${put_row['bid']:.2f}")
-        logging.info(f"  Net Cost: ${call_row['ask']:.2f} - ${put_row['bid']:.2f} = ${net_cost:.2f}")
-        logging.info(f"  Mid-price calculation: ${(call_row['bid'] + call_row['ask'])/2:.2f} - ${(put_row['bid'] + put_row['ask'])/2:.2f} = ${((call_row['bid'] + call_row['ask'])/2) - ((put_row['bid'] + put_row['ask'])/2):.2f}")
-        
-        # Calculate alternative pricing methods for comparison
-        pricing_comparison = calculate_alternative_pricing(call_row, put_row, 'bullish')
-        
-        return {
-            'long_call_strike': call_row['strike'], 'short_put_strike': put_row['strike'],
-            'net_cost': net_cost, 'iv_advantage': put_row['impliedVolatility'] - call_row['impliedVolatility'],
-            'net_delta': call_row['delta'] - put_row['delta'], 'net_vega': call_row['vega'] - put_row['vega'],
-            'max_loss_down': put_row['strike'] - (put_row['bid'] - call_row['ask']),
-            'breakeven': call_row['strike'] + net_cost,
-            'efficiency': efficiency,
-            'pricing_comparison': pricing_comparison
-        }
-    except (KeyError, TypeError):
-        return None
+    incremental = (snapshot_key is not None and INCREMENTAL_RANKING and SNAPSHOT_CACHE_BYTES > 0
+                   and not strategy.get('cross_expiration'))
+    context = (float(underlying_price), T, days_to_exp, risk_free_rate, dividend_yield,
+               tuple(sorted(criteria.items())))
+    previous = _get_snapshot(snapshot_key, context) if incremental else None
 
+    with tracker.stage('prepare'):
+        # Narrow the strike window first so Greeks are only computed for contracts a leg can use
+        calls, puts = select_strike_window(calls, puts, underlying_price, criteria)
+        calls, puts = prefilter_chain(strategy, calls, puts, underlying_price)
+        if previous is not None:
+            add_greeks_reusing(calls, previous['calls'], 'call', underlying_price, T, risk_free_rate, dividend_yield)
+            add_greeks_reusing(puts, previous['puts'], 'put', underlying_price, T, risk_free_rate, dividend_yield)
+        else:
+            add_greeks(calls, 'call', underlying_price, T, risk_free_rate, dividend_yield)
+            add_greeks(puts, 'put', underlying_price, T, risk_free_rate, dividend_yield)
 
-def create_bearish_strategy_combination(put_row, call_row):
-    try:
-        net_cost = put_row['ask'] - call_row['bid']
-        strike_diff = call_row['strike'] - put_row['strike']
-        efficiency = -net_cost / strike_diff if strike_diff > 0 else 0
-        
-        # Add detailed logging for debugging
-        logging.info(f"Bearish Risk Reversal Calculation:")
-        logging.info(f"  Long Put: Strike=${put_row['strike']:.2f}, Ask=${put_row['ask']:.2f}, Bid=${put_row['bid']:.2f}")
-        logging.info(f"  Short Call: Strike=${call_row['strike']:.2f}, Ask=${call_row['ask']:.2f}, Bid=${call_row['bid']:.2f}")
-        logging.info(f"  Net Cost: ${put_row['ask']:.2f} - ${call_row['bid']:.2f} = ${net_cost:.2f}")
-        logging.info(f"  Mid-price calculation: ${(put_row['bid'] + put_row['ask'])/2:.2f} - ${(call_row['bid'] + call_row['ask'])/2:.2f} = ${((put_row['bid'] + put_row['ask'])/2) - ((call_row['bid'] + call_row['ask'])/2):.2f}")
-        
-        # Calculate alternative pricing methods for comparison
-        pricing_comparison = calculate_alternative_pricing(call_row, put_row, 'bearish')
-        
-        return {
-            'long_put_strike': put_row['strike'], 'short_call_strike': call_row['strike'],
-            'net_cost': net_cost, 'iv_advantage': call_row['impliedVolatility'] - put_row['impliedVolatility'],
-            'net_delta': put_row['delta'] - call_row['delta'], 'net_vega': put_row['vega'] - call_row['vega'],
-            'max_loss_up': call_row['strike'] + (call_row['bid'] - put_row['ask']),
-            'breakeven': put_row['strike'] - net_cost,
-            'efficiency': efficiency,
-            'pricing_comparison': pricing_comparison
-        }
-    except (KeyError, TypeError):
-        return None
+    update = None
+    if previous is not None:
+        with tracker.stage('enumerate'):
+            pools = build_leg_pools(strategy, calls, puts, underlying_price)
+            update = update_combinations(strategy, previous['pools'], previous['indices'], pools, criteria)
+        if update is not None:
+            # When the updated candidates are over budget, the full path below narrows the window
+            _, kept_indices, new_indices, new_totals = update
+            estimated_bytes = (previous['row_bytes'] * len(kept_indices) +
+                               estimate_candidate_bytes(strategy, pools, new_indices, new_totals))
+            if tracker.fits(estimated_bytes):
+                tracker.reserve(estimated_bytes)
+            else:
+                update = None
+
+    degraded = len(tracker.degraded)
+    if update is not None:
+        kept, kept_indices, new_indices, new_totals = update
+        with tracker.stage('describe'):
+            # Unchanged combinations keep their previous output; only the new ones are described
+            kept_rows = np.nonzero(kept)[0]
+            order = merge_combination_order(pools, kept_indices, new_indices)
+            indices = np.concatenate([kept_indices, new_indices])[order]
+            reused = np.concatenate([kept_rows, np.full(len(new_indices), -1)])[order]
+            columns, candidates = None, pd.DataFrame()
+            if len(indices):
+                parts = []
+                if len(kept_rows):
+                    parts.append({col: np.asarray(values)[kept_rows] for col, values in previous['columns'].items()})
+                if len(new_indices):
+                    parts.append(describe_combinations(strategy, pools, new_indices, new_totals))
+                columns = {col: np.concatenate([np.asarray(part[col]) for part in parts])[order] for col in parts[0]}
+                candidates = _candidate_frame(strategy, columns, expiration_date, days_to_exp)
+    else:
+        with tracker.stage('enumerate'):
+            pools, indices, totals = _enumerate_within_budget(strategy, calls, puts, underlying_price, criteria,
+                                                              tracker, expiration_date)
+        reused = np.full(len(indices), -1) if previous is not None else None
+        columns = None
+        if len(indices) == 0:
+            candidates = pd.DataFrame()
+        else:
+            with tracker.stage('describe'):
+                columns = describe_combinations(strategy, pools, indices, totals)
+                candidates = _candidate_frame(strategy, columns, expiration_date, days_to_exp)
+
+    version = None
+    if incremental and len(tracker.degraded) > degraded:
+        # A narrowed strike window doesn't match the criteria in the context
+        _drop_snapshot(snapshot_key)
+    elif incremental:
+        if columns is not None:
+            # Views of the candidate frame's columns rather than a second copy
+            columns = {col: candidates[col].to_numpy() for col in columns}
+        row_bytes = _nbytes(candidates) / len(candidates) if len(candidates) else 0.0
+        version = _keep_snapshot(snapshot_key, {'calls': calls, 'puts': puts, 'pools': pools, 'indices': indices,
+                                                'columns': columns, 'row_bytes': row_bytes}, context, tracker,
+                                 shared_bytes=_nbytes(columns))
+    return candidates, previous['version'] if previous is not None else None, version, reused
 
 
-def is_valid_bullish_combo(combo):
-    if not combo: return False
-    if abs(combo['net_cost']) > 20: return False
-    if combo['net_delta'] <= 0.1 or combo['net_vega'] <= 0: return False
-    return True
+def evaluate_cross_expiration(strategy_type, chains, underlying_price, risk_free_rate=0.045, dividend_yield=0.0,
+                              criteria=None, as_of=None, tracker=None):
+    """
+    Every valid combination of a cross-expiration (diagonal) strategy over several expirations.
+    `chains` maps expiration -> (calls, puts) as returned by get_options_data. Greeks use each
+    contract's own time to expiry; the 'expiration' column holds the nearest leg's expiration.
+    """
+    tracker = tracker or StageTracker()
+    strategy = get_strategy(strategy_type)
+    criteria = resolve_criteria(strategy_type, criteria)
+    today = pd.Timestamp(as_of).normalize() if as_of is not None else pd.to_datetime(datetime.now().date())
 
+    with tracker.stage('prepare'):
+        call_frames, put_frames = [], []
+        for expiration_date, (calls, puts) in chains.items():
+            days_to_exp = (pd.to_datetime(expiration_date) - today).days
+            T = max(days_to_exp / 365.0, 1 / (365 * 24))
+            calls, puts = select_strike_window(calls, puts, underlying_price, criteria)
+            calls, puts = prefilter_chain(strategy, calls, puts, underlying_price)
+            for df, option_type, frames in ((calls, 'call', call_frames), (puts, 'put', put_frames)):
+                if df.empty: continue
+                add_greeks(df, option_type, underlying_price, T, risk_free_rate, dividend_yield)
+                df['expiration'] = expiration_date
+                df['days_to_exp'] = days_to_exp
+                frames.append(df)
+        calls = pd.concat(call_frames, ignore_index=True) if call_frames else pd.DataFrame()
+        puts = pd.concat(put_frames, ignore_index=True) if put_frames else pd.DataFrame()
+    if _missing_leg_data(strategy, calls, puts):
+        return pd.DataFrame()
 
-def is_valid_bearish_combo(combo):
-    if not combo: return False
-    if abs(combo['net_cost']) > 20: return False
-    if combo['net_delta'] >= -0.1 or combo['net_vega'] > 0.01: return False
-    return True
+    with tracker.stage('enumerate'):
+        pools, indices, totals = _enumerate_within_budget(strategy, calls, puts, underlying_price, criteria, tracker,
+                                                          'all expirations')
 
+    if len(indices) == 0:
+        return pd.DataFrame()
+    with tracker.stage('describe'):
+        candidates = pd.DataFrame(describe_combinations(strategy, pools, indices, totals))
+        leg_names = [leg['name'] for leg in strategy['legs']]
+        leg_days = candidates[[f'{leg}_days_to_exp' for leg in leg_names]].to_numpy()
+        nearest = leg_days.argmin(axis=1)
+        leg_expirations = candidates[[f'{leg}_expiration' for leg in leg_names]].to_numpy()
+    candidates['strategy_type'] = strategy['name']
+    candidates['expiration'] = leg_expirations[np.arange(len(candidates)), nearest]
+    candidates['days_to_exp'] = leg_days.min(axis=1)
+    return candidates
 
-def rank_combinations(combinations):
-    if not combinations: return []
-    df = pd.DataFrame(combinations)
 
-    def safe_normalize(series, reverse=False):
-        if series.std() == 0 or len(series) < 2: return pd.Series([0.5] * len(series), index=series.index)
-        norm = (series - series.min()) / (series.max() - series.min())
-        return 1 - norm if reverse else norm
+def analyze_bullish_risk_reversal(calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
+                                  dividend_yield=0.0, criteria=None):
+    return evaluate_strategy('Bullish', calls, puts, underlying_price, expiration_date, risk_free_rate,
+                             dividend_yield, criteria).to_dict('records')
+
 
-    df['delta_score'] = safe_normalize(df['net_delta'])
-    df['vega_score'] = safe_normalize(df['net_vega'])
-    df['efficiency_score'] = safe_normalize(df['efficiency'])
-    df['total_score'] = (df['delta_score'] * 0.40 + df['efficiency_score'] * 0.40 + df['vega_score'] * 0.20)
-    return df.sort_values('total_score', ascending=False)
+def analyze_bearish_risk_reversal(calls, puts, underlying_price, expiration_date, risk_free_rate=0.045,
+                                  dividend_yield=0.0, criteria=None):
+    return evaluate_strategy('Bearish', calls, puts, underlying_price, expiration_date, risk_free_rate,
+                             dividend_yield, criteria).to_dict('records')
 
 
-def rank_bearish_combinations(combinations):
-    if not combinations: return []
-    df = pd.DataFrame(combinations)
+def rank_combinations(combinations, weights=None):
+    if len(combinations) == 0: return []
+    return rank_candidates(pd.DataFrame(combinations), get_strategy('Bullish'), weights)
 
-    def safe_normalize(series, reverse=False):
-        if series.std() == 0 or len(series) < 2: return pd.Series([0.5] * len(series), index=series.index)
-        norm = (series - series.min()) / (series.max() - series.min())
-        return 1 - norm if reverse else norm
 
-    # For bearish, we want negative delta (more negative is better), low absolute vega, and good efficiency
-    df['delta_score'] = safe_normalize(df['net_delta'], reverse=True)  # More negative delta is better
-    df['vega_score'] = safe_normalize(df['net_vega'].abs(), reverse=True)  # Lower absolute vega is better
-    df['efficiency_score'] = safe_normalize(df['efficiency'])
-    df['total_score'] = (df['delta_score'] * 0.40 + df['efficiency_score'] * 0.40 + df['vega_score'] * 0.20)
-    return df.sort_values('total_score', ascending=False)
+def rank_bearish_combinations(combinations, weights=None):
+    if len(combinations) == 0: return []
+    return rank_candidates(pd.DataFrame(combinations), get_strategy('Bearish'), weights)
 
 
 # -------------------------------
@@ -361,159 +947,201 @@ Report generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
     return report
 
 
+def format_strategy_report(results, analysis_summary, ticker, strategy):
+    """Text report for strategies without a dedicated layout, using the same sections as format_text_report."""
+    name = strategy['name']
+    if results is None or results.empty:
+        return f"No valid {name.lower()} strategies found for {ticker}."
+
+    best = results.iloc[0]
+    leg_names = [leg['name'] for leg in strategy['legs']]
+    cost_display = f"${abs(best['net_cost']):.2f} {'CREDIT' if best['net_cost'] < 0 else 'DEBIT'}"
+    legs_display = ", ".join(f"{leg.replace('_', ' ').title()}: ${best[f'{leg}_strike']:.2f}" for leg in leg_names)
+    if strategy.get('cross_expiration'):
+        legs_display = ", ".join(f"{leg.replace('_', ' ').title()}: ${best[f'{leg}_strike']:.2f} "
+                                 f"({best[f'{leg}_expiration']})" for leg in leg_names)
+
+    report = f"""
+{'='*80}
+{ticker} {name} Report
+{'='*80}
+
+🎯 TOP RECOMMENDED TRADE
+Expiration: {best['expiration']} ({best['days_to_exp']} days)
+Strikes: {legs_display}
+Net Cost: {cost_display}
+Net Delta: {best['net_delta']:.3f}
+Net Vega: {best['net_vega']:.3f}
+Efficiency: {best['efficiency']:.1%}
+
+🔎 ANALYSIS SUMMARY
+"""
+    for exp, count in analysis_summary.items():
+        report += f"  {exp}: Found {count} valid trades\n"
+
+    report += f"""
+📊 TOP {min(len(results), 5)} COMBINATIONS (Max 3 Per Expiration)
+RANK | EXPIRATION | STRIKES | NET COST | NET VEGA | EFFICIENCY | SCORE
+{"-" * 80}
+"""
+    for i, row in results.head(5).iterrows():
+        strikes = "$" + "/".join(f"{row[f'{leg}_strike']:.2f}" for leg in leg_names)
+        cost_txt = f"${abs(row['net_cost']):.2f} {'CR' if row['net_cost'] < 0 else 'DB'}"
+        report += f"{i+1:4} | {row['expiration']:10} | {strikes:15} | {cost_txt:9} | {row['net_vega']:8.3f} | {row['efficiency']:9.1%} | {row['total_score']:.3f}\n"
+
+    report += f"""
+{'='*80}
+Report generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{'='*80}
+"""
+    return report
+
+
 # -------------------------------
 # Main Analysis Functions
 # -------------------------------
-def run_bullish_analysis(ticker: str, min_dte: int, max_dte: int) -> str:
+def run_ranked_analysis(ticker: str, min_dte: int, max_dte: int, strategy_type: str, criteria=None,
+                        tracker=None):
     """
-    Analyzes bullish strategies and returns a formatted text report.
+    Runs the full pipeline for one strategy from strategies.STRATEGIES ("Bullish", "Bearish", ...).
+    `criteria` overrides entries of DEFAULT_CRITERIA; tighter values cut the work done.
+    `tracker` (a StageTracker) collects per-stage timings and memory, enforces its budget and
+    carries the progress callback and cancel event (AnalysisCancelled propagates to the caller).
+    Returns (report_text, ranked_results) where ranked_results is the DataFrame of every
+    valid combination ranked by total_score, or None when no candidates were found.
     """
+    tracker = tracker or StageTracker()
+    strategy = get_strategy(strategy_type)
+    label = strategy_type.lower()
+
     try:
         # Get stock data
-        stock = yf.Ticker(ticker)
-        history_data = stock.history(period='1d')
-        
-        if history_data.empty:
-            return f"Unable to fetch price data for {ticker}. Please check the ticker symbol and try again."
-        
-        underlying_price = history_data['Close'].iloc[-1]
-        time.sleep(0.4)  # Gentle delay
+        tracker.progress('fetch', f"Fetching {ticker} price...", 0.0)
+        with tracker.stage('fetch'):
+            underlying_price = fetch_underlying_price(ticker)
         
-        today = datetime.now()
+        if underlying_price is None:
+            return f"Unable to fetch price data for {ticker}. Please check the ticker symbol and try again.", None
         
         # Check for available options
+        tracker.progress('fetch', f"Fetching {ticker} expirations...", 0.05)
         try:
-            expirations = stock.options
+            with tracker.stage('fetch'):
+                expirations = fetch_expirations(ticker)
             if not expirations:
-                return f"No options data available for {ticker}. The ticker may not have an options market."
+                return f"No options data available for {ticker}. The ticker may not have an options market.", None
+        except AnalysisCancelled:
+            raise
         except Exception:
-             return f"Could not fetch option expiration dates for {ticker}."
+             return f"Could not fetch option expiration dates for {ticker}.", None
 
-        valid_expirations = [exp for exp in expirations if min_dte <= (datetime.strptime(exp, "%Y-%m-%d") - today).days <= max_dte]
-        time.sleep(0.4)  # Gentle delay
+        cross_expiration = strategy.get('cross_expiration', False)
+        exp_to_analyze = select_expirations(expirations, min_dte, max_dte,
+                                            DIAGONAL_MAX_EXPIRATIONS if cross_expiration else 3)
         
-        if not valid_expirations:
-            return f"No expirations found in the specified date range for {ticker}."
+        if not exp_to_analyze:
+            return f"No expirations found in the specified date range for {ticker}.", None
         
-        exp_to_analyze = valid_expirations[:3]
         analysis_summary = {}
-        all_combinations = []
+        candidate_frames = []
+        frame_sources = []  # per candidate frame, what incremental re-ranking needs to know
+        chains = {}
         
-        for expiration in exp_to_analyze:
+        for i, expiration in enumerate(exp_to_analyze):
             print(f"\n⚡ Analyzing expiration: {expiration}...")
-            time.sleep(0.4)  # Gentle delay
-            calls, puts = get_options_data(ticker, expiration, underlying_price)
-            if calls.empty or puts.empty:
+            tracker.progress('fetch', f"Fetching {expiration} chain ({i + 1}/{len(exp_to_analyze)})...",
+                             0.1 + 0.7 * i / len(exp_to_analyze))
+            with tracker.stage('fetch'):
+                calls, puts = get_options_data(ticker, expiration, underlying_price, criteria)
+            if _missing_leg_data(strategy, calls, puts):
                 print(f"    - No suitable OTM options data found after cleaning.")
                 analysis_summary[expiration] = 0
                 continue
+            if cross_expiration:
+                chains[expiration] = (calls, puts)
+                continue
            
-            combinations = analyze_bullish_risk_reversal(calls, puts, underlying_price, expiration)
-            analysis_summary[expiration] = len(combinations)
-            if combinations:
-                print(f"    ✅ Found {len(combinations)} potential combinations.")
-                all_combinations.extend(combinations)
+            tracker.progress('enumerate', f"Evaluating {expiration} ({i + 1}/{len(exp_to_analyze)})...",
+                             0.1 + 0.7 * (i + 0.5) / len(exp_to_analyze))
+            candidates, previous_version, version, reused = _evaluate_expiration(
+                strategy_type, calls, puts, underlying_price, expiration, criteria=criteria, tracker=tracker,
+                snapshot_key=('chain', ticker.upper(), strategy_type, expiration))
+            analysis_summary[expiration] = len(candidates)
+            if not candidates.empty:
+                print(f"    ✅ Found {len(candidates)} potential combinations.")
+                candidate_frames.append(candidates)
+                frame_sources.append((expiration, len(candidates), previous_version, version, reused))
             else:
                 print(f"    - No valid combinations met the strategy criteria.")
         
-        if not all_combinations:
-            return f"No valid bullish strategies found for {ticker}."
+        if chains:
+            # Diagonals pair legs across all the fetched expirations in one search
+            tracker.progress('enumerate', f"Pairing legs across {len(chains)} expirations...", 0.8)
+            candidates = evaluate_cross_expiration(strategy_type, chains, underlying_price, criteria=criteria,
+                                                   tracker=tracker)
+            counts = candidates['expiration'].value_counts() if not candidates.empty else {}
+            for expiration in chains:
+                analysis_summary[expiration] = int(counts.get(expiration, 0))
+            if not candidates.empty:
+                print(f"    ✅ Found {len(candidates)} potential combinations across {len(chains)} expirations.")
+                candidate_frames.append(candidates)
+                frame_sources.append((None, len(candidates), None, None, None))
+        
+        if not candidate_frames:
+            return f"No valid {label} strategies found for {ticker}.", None
         
-        ranked_results = rank_combinations(all_combinations)
+        tracker.progress('rank', f"Ranking {sum(len(df) for df in candidate_frames)} combinations...", 0.9)
+        with tracker.stage('rank'):
+            ranking_key = ('ranking', ticker.upper(), strategy_type)
+            previous, reused = _previous_ranking(ranking_key, frame_sources)
+            ranked_results = rank_candidates(pd.concat(candidate_frames, ignore_index=True), strategy,
+                                             previous=previous, reused=reused)
+            if any(version is not None for _, _, _, version, _ in frame_sources):
+                _store_ranking(ranking_key, ranked_results, strategy, frame_sources, tracker)
         if isinstance(ranked_results, list) and len(ranked_results) == 0:
-            return f"No valid bullish strategies found for {ticker}."
+            return f"No valid {label} strategies found for {ticker}.", None
         
         # Ensure ranked_results is a DataFrame
         if not isinstance(ranked_results, pd.DataFrame):
-            return f"No valid bullish strategies found for {ticker}."
+            return f"No valid {label} strategies found for {ticker}.", None
         
-        final_results = ranked_results.groupby('expiration').head(3).sort_values('total_score', ascending=False).reset_index(drop=True)
+        final_results = top_per_expiration(ranked_results).reset_index(drop=True)
         
         if final_results.empty:
-            return f"No valid bullish strategies remained after filtering for {ticker}."
-        
-        return format_text_report(final_results, analysis_summary, ticker, "Bullish")
+            return f"No valid {label} strategies remained after filtering for {ticker}.", None
         
+        tracker.progress('report', "Writing report...", 0.95)
+        with tracker.stage('report'):
+            if strategy_type in ("Bullish", "Bearish"):
+                report = format_text_report(final_results, analysis_summary, ticker, strategy_type)
+            else:
+                report = format_strategy_report(final_results, analysis_summary, ticker, strategy)
+        return report, ranked_results
+
+    except MemoryBudgetExceeded as e:
+        logging.warning(f"Analysis of {ticker} aborted: {e}")
+        tracker.aborted = str(e)
+        return f"Analysis of {ticker} was stopped to stay within its memory budget: {e}", None
+    except AnalysisCancelled:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return f"An unexpected error occurred while analyzing {ticker}.\nError: {e}"
+        return f"An unexpected error occurred while analyzing {ticker}.\nError: {e}", None
+
+
+def run_bullish_analysis(ticker: str, min_dte: int, max_dte: int) -> str:
+    """
+    Analyzes bullish strategies and returns a formatted text report.
+    """
+    return run_ranked_analysis(ticker, min_dte, max_dte, "Bullish")[0]
 
 
 def run_bearish_analysis(ticker: str, min_dte: int, max_dte: int) -> str:
     """
     Analyzes bearish strategies and returns a formatted text report.
     """
-    try:
-        # Get stock data
-        stock = yf.Ticker(ticker)
-        history_data = stock.history(period='1d')
-        
-        if history_data.empty:
-            return f"Unable to fetch price data for {ticker}. Please check the ticker symbol and try again."
-        
-        underlying_price = history_data['Close'].iloc[-1]
-        time.sleep(0.4)  # Gentle delay
-        
-        today = datetime.now()
-        
-        # Check for available options
-        try:
-            expirations = stock.options
-            if not expirations:
-                return f"No options data available for {ticker}. The ticker may not have an options market."
-        except Exception:
-             return f"Could not fetch option expiration dates for {ticker}."
-
-        valid_expirations = [exp for exp in expirations if min_dte <= (datetime.strptime(exp, "%Y-%m-%d") - today).days <= max_dte]
-        time.sleep(0.4)  # Gentle delay
-        
-        if not valid_expirations:
-            return f"No expirations found in the specified date range for {ticker}."
-        
-        exp_to_analyze = valid_expirations[:3]
-        analysis_summary = {}
-        all_combinations = []
-        
-        for expiration in exp_to_analyze:
-            print(f"\n⚡ Analyzing expiration: {expiration}...")
-            time.sleep(0.4)  # Gentle delay
-            calls, puts = get_options_data(ticker, expiration, underlying_price)
-            if calls.empty or puts.empty:
-                print(f"    - No suitable OTM options data found after cleaning.")
-                analysis_summary[expiration] = 0
-                continue
-           
-            combinations = analyze_bearish_risk_reversal(calls, puts, underlying_price, expiration)
-            analysis_summary[expiration] = len(combinations)
-            if combinations:
-                print(f"    ✅ Found {len(combinations)} potential combinations.")
-                all_combinations.extend(combinations)
-            else:
-                print(f"    - No valid combinations met the strategy criteria.")
-        
-        if not all_combinations:
-            return f"No valid bearish strategies found for {ticker}."
-        
-        ranked_results = rank_bearish_combinations(all_combinations)
-        if isinstance(ranked_results, list) and len(ranked_results) == 0:
-            return f"No valid bearish strategies found for {ticker}."
-        
-        # Ensure ranked_results is a DataFrame
-        if not isinstance(ranked_results, pd.DataFrame):
-            return f"No valid bearish strategies found for {ticker}."
-        
-        final_results = ranked_results.groupby('expiration').head(3).sort_values('total_score', ascending=False).reset_index(drop=True)
-        
-        if final_results.empty:
-            return f"No valid bearish strategies remained after filtering for {ticker}."
-        
-        return format_text_report(final_results, analysis_summary, ticker, "Bearish")
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return f"An unexpected error occurred while analyzing {ticker}.\nError: {e}"
+    return run_ranked_analysis(ticker, min_dte, max_dte, "Bearish")[0]
 
 
 # -------------------------------
@@ -1,9 +1,45 @@
-from fastapi import FastAPI, Request
+import asyncio
+import heapq
+import hmac
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from analysis_engine import run_bullish_analysis, run_bearish_analysis
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+import numpy as np
+import analysis_engine
+import columnar
+from analysis_engine import (DEFAULT_CRITERIA, StageTracker, analysis_is_cached, cache_time_left, cached_inputs,
+                             fetch_expirations, fetch_option_chain, fetch_underlying_price, peek_cached,
+                             run_isolated_analysis, run_ranked_analysis, same_inputs, select_expirations)
+from profiling import SamplingProfiler
+from strategies import STRATEGIES, find_strategy_type, strategy_slug
+
+@asynccontextmanager
+async def lifespan(app):
+    # Background work defined further down: cache pre-warming and the memory tracking worker
+    if PREWARM_ENABLED:
+        prewarm_scheduler.start()
+    yield
+    prewarm_scheduler.stop()
+    stop_tracked_executor()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for all origins (adjust for production)
 app.add_middleware(
@@ -18,6 +54,299 @@ class AnalyzeRequest(BaseModel):
     ticker: str
     min_dte: int
     max_dte: int
+    # Optional screening criteria (defaults match analysis_engine.DEFAULT_CRITERIA).
+    # They are pushed down into the engine, so tighter values mean less work.
+    max_strike_distance_pct: Optional[float] = Field(None, gt=0)
+    max_net_cost: Optional[float] = Field(None, ge=0)
+    min_abs_net_delta: Optional[float] = Field(None, ge=0)
+    min_net_vega: Optional[float] = None
+    max_net_vega: Optional[float] = None
+    min_bid: Optional[float] = Field(None, ge=0)
+    max_spread_pct: Optional[float] = Field(None, gt=0, le=1)
+    # Opt-in peak memory tracking per pipeline stage, reported under "timings"
+    track_memory: bool = False
+    # Per-request memory budget; can only tighten the server-wide MEMORY_BUDGET_MB
+    memory_budget_mb: Optional[float] = Field(None, gt=0)
+
+    def criteria(self):
+        return {key: getattr(self, key) for key in DEFAULT_CRITERIA}
+
+    def memory_budget(self):
+        budgets = [budget for budget in (MEMORY_BUDGET_MB, self.memory_budget_mb) if budget]
+        return min(budgets) if budgets else None
+
+    def tracker(self):
+        return StageTracker(memory_budget_mb=self.memory_budget(), degrade=MEMORY_BUDGET_DEGRADE)
+
+# --- Memory budget ---
+# Server-wide cap on the estimated candidate memory of one analysis (unset = no cap).
+# Over budget the strike window is narrowed, or the analysis is stopped when degrading is off.
+MEMORY_BUDGET_MB = float(os.environ["VEGAEDGE_MEMORY_BUDGET_MB"]) if os.environ.get("VEGAEDGE_MEMORY_BUDGET_MB") else None
+MEMORY_BUDGET_DEGRADE = os.environ.get("VEGAEDGE_MEMORY_BUDGET_DEGRADE", "1") != "0"
+
+# --- Memory tracking ---
+# tracemalloc is process-wide, so concurrent requests would reset and inflate each other's
+# peaks. Analyses sent with track_memory run one at a time in a worker process of their own
+# (with its own upstream cache); only the cache stage runs here.
+_tracked_executor = None
+_tracked_executor_lock = threading.Lock()
+
+def tracked_executor():
+    global _tracked_executor
+    with _tracked_executor_lock:
+        if _tracked_executor is None:
+            _tracked_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return _tracked_executor
+
+def run_tracked_analysis(req, strategy_type):
+    """run_isolated_analysis in the tracking worker: (result_text, ranked_results, tracker)."""
+    executor = tracked_executor()
+    try:
+        return executor.submit(run_isolated_analysis, req.ticker, req.min_dte, req.max_dte, strategy_type,
+                               req.criteria(), req.memory_budget(), MEMORY_BUDGET_DEGRADE).result()
+    except BrokenProcessPool:
+        # The worker died (e.g. killed for memory); start a fresh one next time
+        global _tracked_executor
+        with _tracked_executor_lock:
+            if _tracked_executor is executor:
+                _tracked_executor = None
+        raise
+
+def stop_tracked_executor():
+    global _tracked_executor
+    with _tracked_executor_lock:
+        executor, _tracked_executor = _tracked_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Ranked candidate cache ---
+# Every analysis stores its full ranking column-wise so /analyses/{id}/candidates
+# can page through it without recomputing anything.
+CANDIDATE_CACHE_TTL = 15 * 60  # seconds
+CANDIDATE_CACHE_SIZE = 128
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Per-row objects that do not fit a columnar page
+NON_COLUMNAR_FIELDS = ("pricing_comparison", "strategy_type")
+
+_candidate_cache = OrderedDict()
+_candidate_cache_lock = threading.Lock()
+
+def cache_ranked_candidates(ticker, strategy_type, ranked_results):
+    """
+    Store the ranked candidates as column arrays and return the analysis id used to
+    page through them, or None when there is nothing to store.
+    """
+    if ranked_results is None or ranked_results.empty:
+        return None
+    data = {"rank": np.arange(1, len(ranked_results) + 1)}
+    for column in ranked_results.columns:
+        if column not in NON_COLUMNAR_FIELDS:
+            data[column] = ranked_results[column].to_numpy()
+
+    analysis_id = uuid.uuid4().hex
+    now = time.time()
+    with _candidate_cache_lock:
+        _candidate_cache[analysis_id] = {
+            "ticker": ticker,
+            "strategy": strategy_type,
+            "total": len(ranked_results),
+            "data": data,
+            "expires_at": now + CANDIDATE_CACHE_TTL,
+        }
+        while _candidate_cache:
+            oldest_id, oldest = next(iter(_candidate_cache.items()))
+            if len(_candidate_cache) <= CANDIDATE_CACHE_SIZE and oldest["expires_at"] > now:
+                break
+            del _candidate_cache[oldest_id]
+    return analysis_id
+
+def get_cached_candidates(analysis_id):
+    with _candidate_cache_lock:
+        entry = _candidate_cache.get(analysis_id)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.time():
+            del _candidate_cache[analysis_id]
+            return None
+        return entry
+
+# --- Response encodings ---
+# Analyze responses and candidate pages are JSON unless the Accept header asks for a typed
+# columnar encoding (see columnar.py). Binary analyze responses carry the first `limit`
+# ranked candidates as typed columns, with the rest of the JSON response as metadata.
+def negotiate_response_type(request: Request):
+    media_type = columnar.negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail="Acceptable response types: " +
+                                                    ", ".join(columnar.available_media_types()))
+    return media_type
+
+def candidate_page(entry, start, end):
+    return {column: values[start:end] for column, values in entry["data"].items()}
+
+def encode_analysis_response(response, media_type, limit):
+    """`response` as is for JSON, else a binary Response with its first `limit` candidates."""
+    if media_type == columnar.JSON_MEDIA_TYPE:
+        return response
+    entry = get_cached_candidates(response["analysis_id"]) if response.get("analysis_id") else None
+    total = entry["total"] if entry else 0
+    end = min(limit, total)
+    meta = dict(response, next_cursor=str(end) if end < total else None)
+    return Response(columnar.encode(media_type, candidate_page(entry, 0, end) if entry else {}, meta),
+                    media_type=media_type)
+
+# --- Cache pre-warming ---
+# Request counts per ticker decay with a half-life; a background thread keeps the quote,
+# expiration and chain caches of the hottest tickers fresh so their requests rarely
+# start cold. It refreshes entries shortly before they expire and everything once
+# ahead of the US market open, spending at most PREWARM_BUDGET_PER_HOUR upstream calls.
+# Chains are refreshed before quotes, so a tight budget leaves the quotes (cheap to fetch
+# on demand) cold rather than the chains.
+PREWARM_ENABLED = os.environ.get("VEGAEDGE_PREWARM", "1") != "0"
+PREWARM_INTERVAL = 15  # seconds between scheduler passes
+PREWARM_TOP_N = 10
+PREWARM_MIN_SCORE = 2.0  # decayed request count a ticker needs to be pre-warmed
+PREWARM_HALF_LIFE = 30 * 60  # seconds
+PREWARM_REFRESH_AHEAD = 0.2  # refresh entries within this fraction of their TTL of expiring
+PREWARM_CHAINS_PER_TICKER = 3  # expirations select_expirations picks by default
+PREWARM_MARKET_OPEN_LEAD = 15 * 60  # seconds before the open to refresh everything
+
+def refresh_ahead(ttl):
+    """Seconds before expiry an entry is refreshed; at least one pass, or a pass could miss it."""
+    return max(ttl * PREWARM_REFRESH_AHEAD, PREWARM_INTERVAL)
+
+def default_prewarm_budget():
+    """Upstream calls per hour that keep the quote, expirations and chains of PREWARM_TOP_N tickers warm."""
+    per_ticker = sum(count * 3600 / (ttl - refresh_ahead(ttl)) for count, ttl in (
+        (1, analysis_engine.QUOTE_CACHE_TTL),
+        (1, analysis_engine.EXPIRATIONS_CACHE_TTL),
+        (PREWARM_CHAINS_PER_TICKER, analysis_engine.CHAIN_CACHE_TTL)))
+    return math.ceil(PREWARM_TOP_N * per_ticker)
+
+PREWARM_BUDGET_PER_HOUR = int(os.environ.get("VEGAEDGE_PREWARM_BUDGET_PER_HOUR") or default_prewarm_budget())
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("America/New_York")
+except Exception:  # no tz database available; Eastern standard time is close enough
+    MARKET_TZ = timezone(timedelta(hours=-5))
+MARKET_OPEN = (9, 30)
+
+class TickerPopularity:
+    """Exponentially decaying request counts per ticker, with the last DTE window asked for."""
+
+    def __init__(self, half_life=PREWARM_HALF_LIFE):
+        self.half_life = half_life
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, entry, now):
+        return entry["score"] * math.pow(0.5, (now - entry["updated"]) / self.half_life)
+
+    def record(self, ticker, min_dte, max_dte):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            score = self._decayed(entry, now) if entry else 0.0
+            self._entries[ticker] = {"score": score + 1.0, "updated": now, "dte": (min_dte, max_dte)}
+
+    def hottest(self, n, min_score=0.0):
+        """[(ticker, score, (min_dte, max_dte))] for the `n` most requested tickers, hottest first."""
+        now = time.time()
+        with self._lock:
+            scored = [(ticker, self._decayed(entry, now), entry["dte"]) for ticker, entry in self._entries.items()]
+            # Forget tickers nobody has asked for in a long while
+            for ticker, score, _ in scored:
+                if score < 0.01:
+                    del self._entries[ticker]
+        scored = [item for item in scored if item[1] >= min_score]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:n]
+
+class PrewarmScheduler:
+    def __init__(self, popularity, budget_per_hour=PREWARM_BUDGET_PER_HOUR):
+        self.popularity = popularity
+        self.budget_per_hour = budget_per_hour
+        self.stats = {"passes": 0, "refreshed": 0, "skipped_budget": 0, "errors": 0}
+        self._calls = deque()  # timestamps of upstream calls in the last hour
+        self._warmed_for_open = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(PREWARM_INTERVAL):
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Cache pre-warming pass failed")
+
+    def _spend(self):
+        """Take one upstream call from the hourly budget; False when it is used up."""
+        now = time.time()
+        while self._calls and self._calls[0] <= now - 3600:
+            self._calls.popleft()
+        if len(self._calls) >= self.budget_per_hour:
+            return False
+        self._calls.append(now)
+        return True
+
+    def _before_open(self, now=None):
+        """The trading day to warm for when inside the pre-open window, else None."""
+        now = now or datetime.now(MARKET_TZ)
+        market_open = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+        if now.weekday() < 5 and 0 <= (market_open - now).total_seconds() <= PREWARM_MARKET_OPEN_LEAD:
+            return now.date()
+        return None
+
+    def _due(self, key, ttl, force):
+        left = cache_time_left(key)
+        return force or left is None or left < refresh_ahead(ttl)
+
+    def _refresh(self, fetch, *args):
+        if not self._spend():
+            self.stats["skipped_budget"] += 1
+            return None
+        try:
+            value = fetch(*args, refresh=True)
+            self.stats["refreshed"] += 1
+            return value
+        except Exception:
+            self.stats["errors"] += 1
+            return None
+
+    def run_once(self):
+        """One pass over the hottest tickers, refreshing whatever is missing or about to expire."""
+        self.stats["passes"] += 1
+        open_day = self._before_open()
+        force = open_day is not None and open_day != self._warmed_for_open
+        hottest = self.popularity.hottest(PREWARM_TOP_N, PREWARM_MIN_SCORE)
+        for ticker, _, (min_dte, max_dte) in hottest:
+            expirations = None
+            if self._due(("expirations", ticker), analysis_engine.EXPIRATIONS_CACHE_TTL, force):
+                expirations = self._refresh(fetch_expirations, ticker)
+            if expirations is None:
+                # Never fetches: a skipped or failed refresh must not go upstream around the budget
+                expirations = peek_cached(("expirations", ticker))
+            for expiration in select_expirations(expirations or (), min_dte, max_dte, PREWARM_CHAINS_PER_TICKER):
+                if self._due(("chain", ticker, expiration), analysis_engine.CHAIN_CACHE_TTL, force):
+                    self._refresh(fetch_option_chain, ticker, expiration)
+        for ticker, _, _ in hottest:
+            if self._due(("quote", ticker), analysis_engine.QUOTE_CACHE_TTL, force):
+                self._refresh(fetch_underlying_price, ticker)
+        if force:
+            self._warmed_for_open = open_day
+
+ticker_popularity = TickerPopularity()
+prewarm_scheduler = PrewarmScheduler(ticker_popularity)
 
 def parse_analysis_result(result_text):
     """
@@ -82,34 +411,436 @@ def parse_analysis_result(result_text):
         "top_5": top_5_data
     }
 
-@app.post("/analyze/bullish")
-def analyze_bullish(req: AnalyzeRequest):
+def run_analysis_request(req: AnalyzeRequest, strategy_type: str, live: bool = False):
+    """Run one analysis for the API. Live feed refreshes (`live`) are not counted towards the
+    ticker's popularity and their candidates are not cached, so they carry no analysis_id."""
+    if not live:
+        ticker_popularity.record(req.ticker.upper(), req.min_dte, req.max_dte)
+    tracker = StageTracker() if req.track_memory else req.tracker()
     try:
-        result_text = run_bullish_analysis(req.ticker, req.min_dte, req.max_dte)
+        if req.track_memory:
+            result_text, ranked_results, tracker = run_tracked_analysis(req, strategy_type)
+        else:
+            result_text, ranked_results = run_ranked_analysis(req.ticker, req.min_dte, req.max_dte, strategy_type,
+                                                               req.criteria(), tracker)
         parsed_result = parse_analysis_result(result_text)
-        return {"result": parsed_result}
+        if tracker.aborted:
+            parsed_result["summary"] = result_text
+        analysis_id = None
+        if not live:
+            with tracker.stage("cache"):
+                analysis_id = cache_ranked_candidates(req.ticker, strategy_type, ranked_results)
+        return {
+            "result": parsed_result,
+            "analysis_id": analysis_id,
+            "total_candidates": 0 if ranked_results is None else len(ranked_results),
+            "timings": tracker.report(),
+        }
     except Exception as e:
         return {"result": {
             "summary": f"Analysis Error: {str(e)}",
             "risk": "",
             "pricing_comparison": "",
             "top_5": []
-        }}
+        }, "timings": tracker.report()}
+
+# --- Admission control ---
+# At most MAX_CONCURRENT_ANALYSES analyses run at once; up to MAX_QUEUED_ANALYSES more
+# wait in a queue where requests served from the upstream cache go ahead of cold ones.
+# Beyond that requests are turned away at once with 429 and a Retry-After estimate.
+# Queued requests whose client has gone away give up their place.
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("VEGAEDGE_MAX_CONCURRENT_ANALYSES", "4"))
+MAX_QUEUED_ANALYSES = int(os.environ.get("VEGAEDGE_MAX_QUEUED_ANALYSES", "32"))
+DISCONNECT_POLL_INTERVAL = 0.5  # seconds between client checks while queued
+# /health answers with this status while the queue is full, so load balancers route around us
+HEALTH_BUSY_STATUS = int(os.environ.get("VEGAEDGE_HEALTH_BUSY_STATUS", "503"))
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("analysis queue is full")
+        self.retry_after = retry_after
+
+class ClientGone(Exception):
+    def __init__(self):
+        super().__init__("client disconnected while queued")
+
+class AdmissionController:
+    """Bounded priority queue in front of the analyses. Lives on the event loop, so needs no locks."""
+
+    WARM, COLD, BACKGROUND = 0, 1, 2
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_ANALYSES, max_queued=MAX_QUEUED_ANALYSES):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.rejected_background = 0  # live refreshes skipped for a full queue, not client rejections
+        self.abandoned = 0
+        self.service_time = 2.0  # running average of an analysis, seconds
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._waits = deque(maxlen=1000)
+
+    @property
+    def queue_depth(self):
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self):
+        backlog = self.queue_depth + self.active
+        return max(1, math.ceil(backlog * self.service_time / self.max_concurrent))
+
+    @asynccontextmanager
+    async def slot(self, priority, is_disconnected=None):
+        """
+        Wait for a free analysis slot; raises QueueFull when the queue is at capacity. While
+        queued, `is_disconnected` (e.g. Request.is_disconnected) is polled and ClientGone
+        raised once it returns True.
+        """
+        enqueued = time.perf_counter()
+        if self.active < self.max_concurrent and not self.queue_depth:
+            self.active += 1
+        else:
+            if self.queue_depth >= self.max_queued:
+                if priority == self.BACKGROUND:
+                    self.rejected_background += 1
+                else:
+                    self.rejected += 1
+                raise QueueFull(self.retry_after())
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            poll_interval = None if is_disconnected is None else DISCONNECT_POLL_INTERVAL
+            try:
+                while not future.done():
+                    await asyncio.wait({future}, timeout=poll_interval)
+                    if not future.done() and await is_disconnected():
+                        # Cancelled waiters are skipped by _release and no longer count as queued.
+                        # The slot may have been handed over during the check: pass it on then.
+                        if not future.cancel():
+                            self._release()
+                        self.abandoned += 1
+                        raise ClientGone()
+            except asyncio.CancelledError:
+                # The slot may have been handed over just as the client went away
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    future.cancel()
+                raise
+        self.admitted += 1
+        started = time.perf_counter()
+        self._waits.append(started - enqueued)
+        try:
+            yield
+        finally:
+            self.service_time = 0.9 * self.service_time + 0.1 * (time.perf_counter() - started)
+            self._release()
+
+    def _release(self):
+        self.active -= 1
+        while self._waiters and self.active < self.max_concurrent:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self.active += 1
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rejected_background": self.rejected_background,
+            "abandoned": self.abandoned,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "p95_wait_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else 0.0,
+            "avg_analysis_s": round(self.service_time, 3),
+        }
+
+admission = AdmissionController()
+
+async def admit_and_run(req: AnalyzeRequest, strategy_type: str, request: Request, profile: bool,
+                        limit: int = DEFAULT_PAGE_SIZE):
+    if profile:
+        # Before queueing, so unauthenticated profile requests take no queue place or slot
+        require_admin(request)
+    media_type = negotiate_response_type(request)
+    warm = analysis_is_cached(req.ticker, req.min_dte, req.max_dte)
+    try:
+        async with admission.slot(AdmissionController.WARM if warm else AdmissionController.COLD,
+                                  request.is_disconnected):
+            return await run_in_threadpool(handle_analyze, req, strategy_type, request, profile, media_type, limit)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail="Too many analyses in progress, retry later.",
+                            headers={"Retry-After": str(e.retry_after)})
+    except ClientGone:
+        # Nobody is listening any more; 499 as in "client closed request"
+        return Response(status_code=499)
+
+# --- On-demand profiling ---
+# Admins can add ?profile=true to an analyze request to run it under the sampling profiler.
+# The collapsed stacks are kept for a while under the request id (X-Request-ID header if
+# sent) and served by GET /profiles/{request_id}. Disabled unless VEGAEDGE_ADMIN_TOKEN is set.
+ADMIN_TOKEN = os.environ.get("VEGAEDGE_ADMIN_TOKEN")
+PROFILE_CACHE_TTL = 60 * 60  # seconds
+PROFILE_CACHE_SIZE = 32
+
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+def require_admin(request: Request):
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+def store_profile(request_id, profile):
+    now = time.time()
+    with _profile_cache_lock:
+        _profile_cache[request_id] = dict(profile, expires_at=now + PROFILE_CACHE_TTL)
+        _profile_cache.move_to_end(request_id)
+        while _profile_cache:
+            oldest_id, oldest = next(iter(_profile_cache.items()))
+            if len(_profile_cache) <= PROFILE_CACHE_SIZE and oldest["expires_at"] > now:
+                break
+            del _profile_cache[oldest_id]
+
+def handle_analyze(req: AnalyzeRequest, strategy_type: str, request: Request, profile: bool,
+                   media_type=columnar.JSON_MEDIA_TYPE, limit=DEFAULT_PAGE_SIZE):
+    if not profile:
+        return encode_analysis_response(run_analysis_request(req, strategy_type), media_type, limit)
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    with SamplingProfiler() as profiler:
+        response = run_analysis_request(req, strategy_type)
+    store_profile(request_id, {"ticker": req.ticker, "strategy": strategy_type, "samples": profiler.samples,
+                               "duration_s": profiler.duration, "collapsed": profiler.collapsed()})
+    response["profile"] = {"request_id": request_id, "samples": profiler.samples,
+                           "url": f"/profiles/{request_id}"}
+    return encode_analysis_response(response, media_type, limit)
+
+@app.post("/analyze/bullish")
+async def analyze_bullish(req: AnalyzeRequest, request: Request, profile: bool = False,
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    return await admit_and_run(req, "Bullish", request, profile, limit)
 
 @app.post("/analyze/bearish")
-def analyze_bearish(req: AnalyzeRequest):
+async def analyze_bearish(req: AnalyzeRequest, request: Request, profile: bool = False,
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    return await admit_and_run(req, "Bearish", request, profile, limit)
+
+@app.get("/strategies")
+def list_strategies():
+    return {"strategies": [
+        {"id": strategy_slug(strategy_type), "name": strategy["name"],
+         "legs": [{key: leg[key] for key in ("name", "type", "side")} for leg in strategy["legs"]]}
+        for strategy_type, strategy in STRATEGIES.items()
+    ]}
+
+@app.post("/analyze/strategies/{strategy_id}")
+async def analyze_strategy(strategy_id: str, req: AnalyzeRequest, request: Request, profile: bool = False,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    strategy_type = find_strategy_type(strategy_id)
+    if strategy_type is None:
+        raise HTTPException(status_code=404, detail=f"Unknown strategy '{strategy_id}'.")
+    return await admit_and_run(req, strategy_type, request, profile, limit)
+
+@app.get("/profiles/{request_id}", response_class=PlainTextResponse)
+def get_profile(request_id: str, request: Request):
+    """Collapsed stacks of a profiled request, ready for flamegraph.pl or speedscope."""
+    require_admin(request)
+    with _profile_cache_lock:
+        entry = _profile_cache.get(request_id)
+    if entry is None or entry["expires_at"] <= time.time():
+        raise HTTPException(status_code=404, detail="Unknown or expired profile id.")
+    return entry["collapsed"]
+
+# --- Live subscriptions ---
+# Clients on /ws/live subscribe to (ticker, strategy, DTE window). Every distinct key has a
+# single refresh loop no matter how many clients watch it, and its result is pushed to all
+# of them only when the top combinations change. A round whose quote and chains are still
+# the same cached entries as the last analysis is skipped (chains are cached for 5 minutes,
+# so most rounds in between would only re-rank identical data).
+LIVE_REFRESH_INTERVAL = 30  # seconds
+LIVE_QUEUE_SIZE = 16  # pending messages per connection before the oldest are dropped
+
+def _offer(queue, message):
+    """Queue a message for a connection without waiting; a slow client loses its oldest messages."""
+    while True:
+        try:
+            queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            queue.get_nowait()
+
+class LiveFeed:
+    def __init__(self, subscription_id, req, strategy_type):
+        self.subscription_id = subscription_id
+        self.req = req
+        self.strategy_type = strategy_type
+        self.subscribers = set()
+        self.last_top = None
+        self.last_message = None
+        self.last_inputs = None
+        self.task = None
+
+    async def run(self):
+        while self.subscribers:
+            inputs = cached_inputs(self.req.ticker, self.req.min_dte, self.req.max_dte, self.strategy_type)
+            if same_inputs(inputs, self.last_inputs):
+                await asyncio.sleep(LIVE_REFRESH_INTERVAL)
+                continue
+            try:
+                # Refreshes queue behind interactive requests and skip a round when the queue is full
+                async with admission.slot(AdmissionController.BACKGROUND):
+                    response = await run_in_threadpool(run_analysis_request, self.req, self.strategy_type, live=True)
+            except QueueFull:
+                pass
+            except Exception:
+                logging.exception(f"Live refresh of {self.subscription_id} failed")
+            else:
+                # Inputs read before the analysis: if it fetched anything, the next round runs again
+                self.last_inputs = inputs
+                top = response["result"]["top_5"]
+                if self.last_message is None or top != self.last_top:
+                    self.last_top = top
+                    self.last_message = {"type": "update", "subscription": self.subscription_id,
+                                         "updated_at": time.time(), **response}
+                    for queue in list(self.subscribers):
+                        _offer(queue, self.last_message)
+            await asyncio.sleep(LIVE_REFRESH_INTERVAL)
+
+class SubscriptionHub:
+    def __init__(self):
+        self.feeds = {}
+
+    @staticmethod
+    def subscription_id(req, strategy_type):
+        return f"{req.ticker.upper()}:{strategy_slug(strategy_type)}:{req.min_dte}-{req.max_dte}"
+
+    def subscribe(self, queue, req, strategy_type):
+        subscription_id = self.subscription_id(req, strategy_type)
+        feed = self.feeds.get(subscription_id)
+        if feed is None:
+            feed = self.feeds[subscription_id] = LiveFeed(subscription_id, req, strategy_type)
+        feed.subscribers.add(queue)
+        if feed.task is None:
+            feed.task = asyncio.create_task(feed.run())
+        elif feed.last_message is not None:
+            _offer(queue, feed.last_message)
+        return subscription_id
+
+    def unsubscribe(self, queue, subscription_id):
+        feed = self.feeds.get(subscription_id)
+        if feed is None:
+            return
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            feed.task.cancel()
+            del self.feeds[subscription_id]
+
+live_hub = SubscriptionHub()
+
+async def _pump(websocket: WebSocket, queue):
+    while True:
+        await websocket.send_json(await queue.get())
+
+@app.websocket("/ws/live")
+async def live_updates(websocket: WebSocket):
+    """
+    Messages from the client:
+      {"action": "subscribe", "ticker": "AAPL", "strategy": "bullish", "min_dte": 30, "max_dte": 90}
+      {"action": "unsubscribe", "subscription": "AAPL:bullish:30-90"}
+    The server answers with "subscribed"/"unsubscribed"/"error" messages and pushes
+    "update" messages shaped like the analyze responses.
+    """
+    await websocket.accept()
+    queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+    sender = asyncio.create_task(_pump(websocket, queue))
+    subscriptions = set()
     try:
-        result_text = run_bearish_analysis(req.ticker, req.min_dte, req.max_dte)
-        parsed_result = parse_analysis_result(result_text)
-        return {"result": parsed_result}
-    except Exception as e:
-        return {"result": {
-            "summary": f"Analysis Error: {str(e)}",
-            "risk": "",
-            "pricing_comparison": "",
-            "top_5": []
-        }}
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                _offer(queue, {"type": "error", "detail": "Messages must be JSON."})
+                continue
+            action = message.get("action") if isinstance(message, dict) else None
+            if action == "subscribe":
+                strategy_type = find_strategy_type(str(message.get("strategy", "bullish")))
+                if strategy_type is None:
+                    _offer(queue, {"type": "error", "detail": f"Unknown strategy '{message.get('strategy')}'."})
+                    continue
+                try:
+                    req = AnalyzeRequest(**{key: message[key] for key in ("ticker", "min_dte", "max_dte")
+                                            if key in message})
+                except ValidationError as e:
+                    _offer(queue, {"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+                    continue
+                subscription_id = live_hub.subscription_id(req, strategy_type)
+                if subscription_id not in subscriptions:
+                    _offer(queue, {"type": "subscribed", "subscription": subscription_id})
+                    live_hub.subscribe(queue, req, strategy_type)
+                    subscriptions.add(subscription_id)
+            elif action == "unsubscribe":
+                subscription_id = message.get("subscription")
+                if subscription_id in subscriptions:
+                    live_hub.unsubscribe(queue, subscription_id)
+                    subscriptions.discard(subscription_id)
+                _offer(queue, {"type": "unsubscribed", "subscription": subscription_id})
+            else:
+                _offer(queue, {"type": "error", "detail": "Unknown action; use subscribe or unsubscribe."})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for subscription_id in subscriptions:
+            live_hub.unsubscribe(queue, subscription_id)
+        sender.cancel()
+
+@app.get("/analyses/{analysis_id}/candidates")
+def list_candidates(analysis_id: str, request: Request, cursor: Optional[str] = None,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Page through every ranked candidate of an earlier analysis.
+    Rows are returned column-oriented; pass next_cursor back to fetch the following page.
+    The Accept header selects JSON (default) or a typed columnar encoding of the page.
+    """
+    media_type = negotiate_response_type(request)
+    entry = get_cached_candidates(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis id. Run the analysis again.")
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if start < 0 or start > entry["total"]:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    end = min(start + limit, entry["total"])
+    data = candidate_page(entry, start, end)
+    if media_type == columnar.JSON_MEDIA_TYPE:
+        data = {column: values.tolist() for column, values in data.items()}
+    page = {
+        "analysis_id": analysis_id,
+        "ticker": entry["ticker"],
+        "strategy": entry["strategy"],
+        "total": entry["total"],
+        "columns": list(entry["data"]),
+        "data": data,
+        "next_cursor": str(end) if end < entry["total"] else None,
+    }
+    if media_type == columnar.JSON_MEDIA_TYPE:
+        return page
+    del page["data"]
+    return Response(columnar.encode(media_type, data, page), media_type=media_type)
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy", "message": "VegaEdge API is running"} 
\ No newline at end of file
+def health_check(response: Response):
+    stats = admission.stats()
+    saturated = stats["queue_depth"] >= stats["max_queued"]
+    if saturated:
+        response.status_code = HEALTH_BUSY_STATUS
+    return {"status": "busy" if saturated else "healthy", "message": "VegaEdge API is running",
+            "admission": stats, "upstream": analysis_engine.data_client.stats(),
+            "snapshots": analysis_engine.snapshot_cache_stats()}
\ No newline at end of file
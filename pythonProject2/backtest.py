@@ -0,0 +1,255 @@
+"""
+Offline backtester for the strategy rankings.
+
+Replays the screening and ranking rules of analysis_engine against local option
+chain snapshots, one trading day at a time, and tracks the realized P&L of the
+top-ranked trades held to expiry. Combinations come from the shared vectorized
+core in strategies.py and tickers are spread across all cores, so year-long
+multi-ticker studies stay practical.
+
+Snapshot layout (one file per ticker per trading day):
+
+    <snapshot_dir>/<TICKER>/<YYYY-MM-DD>.csv     (or .parquet)
+
+Each file has one row per contract with the columns
+option_type ('call'/'put'), expiration, strike, bid, ask, impliedVolatility,
+volume, openInterest and underlying_price. `record_chain_snapshot` writes
+files in this format from live Yahoo Finance data.
+
+Usage:
+    python backtest.py --snapshots snapshots --tickers AAPL,MSFT --min-dte 30 --max-dte 120 \\
+        --weights default=0.4,0.4,0.2 --weights delta_heavy=0.6,0.3,0.1 --out trades.csv
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import clean_option_chain, data_client, evaluate_strategy
+from strategies import get_strategy, leg_payoffs, rank_candidates, top_per_expiration
+
+SNAPSHOT_COLUMNS = ['option_type', 'expiration', 'strike', 'bid', 'ask', 'impliedVolatility', 'volume',
+                    'openInterest', 'underlying_price']
+STRATEGIES = ('Bullish', 'Bearish')
+TRADE_COLUMNS = ['expiration', 'days_to_exp', 'net_cost', 'net_delta', 'net_vega', 'efficiency']
+
+
+# -------------------------------
+# Snapshot Storage
+# -------------------------------
+def record_chain_snapshot(ticker, snapshot_dir, as_of=None):
+    """Fetch the full option chain for `ticker` and store it as today's snapshot. Returns the file path."""
+    stock = data_client.ticker(ticker, fresh=True)
+    history_data = stock.history(period='1d')
+    if history_data.empty:
+        raise ValueError(f"Unable to fetch price data for {ticker}.")
+    underlying_price = float(history_data['Close'].iloc[-1])
+
+    frames = []
+    for expiration in stock.options:
+        opt_chain = stock.option_chain(expiration)
+        for df, option_type in [(opt_chain.calls, 'call'), (opt_chain.puts, 'put')]:
+            if df is None or df.empty: continue
+            df = df.copy()
+            df['option_type'] = option_type
+            df['expiration'] = expiration
+            frames.append(df)
+        time.sleep(0.2)
+
+    if not frames:
+        raise ValueError(f"No options data available for {ticker}.")
+    chain = pd.concat(frames, ignore_index=True)
+    chain['underlying_price'] = underlying_price
+
+    day = (as_of or datetime.now()).strftime('%Y-%m-%d')
+    ticker_dir = os.path.join(snapshot_dir, ticker.upper())
+    os.makedirs(ticker_dir, exist_ok=True)
+    path = os.path.join(ticker_dir, f"{day}.csv")
+    chain[SNAPSHOT_COLUMNS].to_csv(path, index=False)
+    return path
+
+
+def list_snapshot_days(snapshot_dir, ticker, start=None, end=None):
+    """Return sorted (date, path) pairs for the snapshots of `ticker` inside [start, end]."""
+    ticker_dir = os.path.join(snapshot_dir, ticker.upper())
+    if not os.path.isdir(ticker_dir):
+        return []
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) if end else None
+
+    days = []
+    for name in os.listdir(ticker_dir):
+        stem, ext = os.path.splitext(name)
+        if ext not in ('.csv', '.parquet'): continue
+        try:
+            day = pd.Timestamp(datetime.strptime(stem, "%Y-%m-%d"))
+        except ValueError:
+            continue
+        if (start is not None and day < start) or (end is not None and day > end): continue
+        days.append((day, os.path.join(ticker_dir, name)))
+    return sorted(days)
+
+
+def load_snapshot(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+# -------------------------------
+# Settlement Helpers
+# -------------------------------
+def _settlement_prices(price_days, prices, expirations):
+    """Underlying close on (or the last snapshot before) each expiry; NaN when expiry is past the data."""
+    exp_days = pd.to_datetime(expirations).values.astype('datetime64[D]')
+    pos = np.searchsorted(price_days, exp_days, side='right') - 1
+    settled = (exp_days <= price_days[-1]) & (pos >= 0)
+    return np.where(settled, prices[np.clip(pos, 0, None)], np.nan)
+
+
+# -------------------------------
+# Backtest Driver
+# -------------------------------
+def backtest_ticker(ticker, snapshot_dir, min_dte, max_dte, strategies=STRATEGIES, weight_sets=None, top_n=5,
+                    start=None, end=None, criteria=None, risk_free_rate=0.045, dividend_yield=0.0):
+    """
+    Replay the ranking for one ticker over every snapshot day and return a DataFrame
+    with one row per selected trade, strategy and weight set.
+    """
+    # Legs of a diagonal expire on different days, which holding to a single expiry cannot price
+    strategies = [strategy_type for strategy_type in strategies
+                  if not get_strategy(strategy_type).get('cross_expiration')]
+    days = list_snapshot_days(snapshot_dir, ticker, start, end)
+    if not days:
+        logging.warning(f"No snapshots found for {ticker}.")
+        return pd.DataFrame()
+
+    chains = [(day, load_snapshot(path)) for day, path in days]
+    price_days = np.array([day.to_datetime64() for day, _ in chains], dtype='datetime64[D]')
+    prices = np.array([float(chain['underlying_price'].iloc[0]) for _, chain in chains])
+
+    trades = []
+    for (day, chain), underlying_price in zip(chains, prices):
+        exp_dates = pd.to_datetime(chain['expiration'])
+        chain = chain.assign(days_to_exp=(exp_dates - day).dt.days)
+        in_window = chain[(chain['days_to_exp'] >= min_dte) & (chain['days_to_exp'] <= max_dte)]
+        exp_to_analyze = sorted(in_window['expiration'].unique())[:3]
+
+        per_strategy = {strategy_type: [] for strategy_type in strategies}
+        for expiration, exp_chain in in_window[in_window['expiration'].isin(exp_to_analyze)].groupby('expiration'):
+            calls = clean_option_chain(exp_chain[exp_chain['option_type'] == 'call'], underlying_price, expiration,
+                                       criteria)
+            puts = clean_option_chain(exp_chain[exp_chain['option_type'] == 'put'], underlying_price, expiration,
+                                      criteria)
+            for strategy_type in strategies:
+                candidates = evaluate_strategy(strategy_type, calls, puts, underlying_price, expiration,
+                                               risk_free_rate, dividend_yield, criteria, as_of=day)
+                if not candidates.empty:
+                    per_strategy[strategy_type].append(candidates)
+
+        for strategy_type, frames in per_strategy.items():
+            if not frames: continue
+            strategy = get_strategy(strategy_type)
+            cands = pd.concat(frames, ignore_index=True)
+            leg_columns = [f"{leg['name']}_strike" for leg in strategy['legs']]
+            for label, weights in (weight_sets or {'default': strategy['weights']}).items():
+                # The same scoring and top-3-per-expiration pick the API serves, under these weights
+                ranked = rank_candidates(cands.copy(deep=False), strategy, weights=weights)
+                picked = top_per_expiration(ranked).head(top_n)
+                trade = picked[leg_columns + TRADE_COLUMNS].reset_index(drop=True)
+                trade.insert(0, 'ticker', ticker)
+                trade.insert(1, 'date', day)
+                trade.insert(2, 'strategy', strategy_type)
+                trade.insert(3, 'weights', label)
+                trade.insert(4, 'rank', np.arange(1, len(picked) + 1))
+                trade['total_score'] = picked['total_score'].to_numpy()
+                trade['underlying_price'] = underlying_price
+
+                # Hold every leg to expiry; a stock position (collars) is marked from today's price
+                settle = _settlement_prices(price_days, prices, trade['expiration'])
+                payoff = leg_payoffs(strategy, {leg['name']: trade[f"{leg['name']}_strike"].to_numpy()
+                                                for leg in strategy['legs']}, settle)
+                payoff = payoff + strategy.get('stock_delta', 0.0) * (settle - underlying_price)
+                trade['settlement_price'] = settle
+                trade['pnl'] = payoff - trade['net_cost'].to_numpy()
+                trade['pnl_per_contract'] = trade['pnl'] * 100
+                trades.append(trade)
+
+    if not trades:
+        return pd.DataFrame()
+    return pd.concat(trades, ignore_index=True)
+
+
+def summarize_backtest(trades):
+    """Aggregate realized P&L per strategy and weight set, counting only settled trades."""
+    if trades.empty:
+        return pd.DataFrame()
+    settled = trades.dropna(subset=['pnl'])
+    summary = settled.groupby(['strategy', 'weights']).agg(
+        trades=('pnl', 'size'), win_rate=('pnl', lambda pnl: (pnl > 0).mean()), mean_pnl=('pnl', 'mean'),
+        median_pnl=('pnl', 'median'), total_pnl=('pnl', 'sum'), worst_pnl=('pnl', 'min'))
+    summary['open_trades'] = trades[trades['pnl'].isna()].groupby(['strategy', 'weights']).size()
+    return summary.fillna({'open_trades': 0}).reset_index()
+
+
+def run_backtest(tickers, snapshot_dir, min_dte, max_dte, strategies=STRATEGIES, weight_sets=None, top_n=5,
+                 start=None, end=None, criteria=None, max_workers=None):
+    """Backtest every ticker in parallel across processes. Returns (trades, summary) DataFrames."""
+    max_workers = max_workers or os.cpu_count()
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(backtest_ticker, ticker, snapshot_dir, min_dte, max_dte, strategies, weight_sets,
+                               top_n, start, end, criteria): ticker for ticker in tickers}
+        for future, ticker in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logging.error(f"Backtest failed for {ticker}: {e}")
+
+    results = [df for df in results if not df.empty]
+    trades = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    return trades, summarize_backtest(trades)
+
+
+def _parse_weights(spec):
+    label, _, values = spec.partition('=')
+    delta, efficiency, vega = (float(v) for v in values.split(','))
+    return label, {'delta': delta, 'efficiency': efficiency, 'vega': vega}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the risk reversal ranking on local chain snapshots.")
+    parser.add_argument('--snapshots', required=True, help="Snapshot directory (<dir>/<TICKER>/<YYYY-MM-DD>.csv)")
+    parser.add_argument('--tickers', help="Comma separated tickers (default: every ticker in the snapshot directory)")
+    parser.add_argument('--strategies', default='Bullish,Bearish',
+                        help="Comma separated strategy names from strategies.STRATEGIES")
+    parser.add_argument('--min-dte', type=int, default=30)
+    parser.add_argument('--max-dte', type=int, default=120)
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--weights', action='append', default=[],
+                        help="label=delta,efficiency,vega (repeat to compare several weightings)")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--out', help="Write the per-trade results to this CSV file")
+    args = parser.parse_args()
+
+    tickers = args.tickers.split(',') if args.tickers else sorted(os.listdir(args.snapshots))
+    weight_sets = dict(_parse_weights(spec) for spec in args.weights) or None
+    started = time.perf_counter()
+    trades, summary = run_backtest(tickers, args.snapshots, args.min_dte, args.max_dte,
+                                   tuple(args.strategies.split(',')), weight_sets, args.top_n, args.start, args.end,
+                                   max_workers=args.workers)
+    print(summary.to_string(index=False) if not summary.empty else "No trades found.")
+    print(f"\nBacktested {len(tickers)} tickers in {time.perf_counter() - started:.1f}s")
+    if args.out and not trades.empty:
+        trades.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
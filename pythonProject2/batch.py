@@ -0,0 +1,300 @@
+"""
+Headless batch runner for nightly jobs.
+
+Ranks every ticker of a ticker file for a set of strategies and DTE window and writes
+all ranked candidates (not just the text report's top rows) to one CSV or Parquet file.
+Chains are fetched by a few threads sharing one rate limiter, and the CPU-bound
+enumeration and ranking runs in a process pool, so fetching and ranking overlap.
+
+Progress is checkpointed per ticker next to the output (`<out>.checkpoint/`): an
+interrupted batch started again with the same arguments only fetches and ranks the
+tickers that are not done yet.
+
+Usage:
+    python batch.py tickers.txt --strategies Bullish,Bearish,iron-condor --min-dte 30 --max-dte 90 \\
+        --out candidates.parquet --rate 2 --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import analysis_engine
+from analysis_engine import (DEFAULT_CRITERIA, DIAGONAL_MAX_EXPIRATIONS, clean_option_chain, evaluate_cross_expiration,
+                             evaluate_strategy, fetch_expirations, fetch_option_chain, fetch_underlying_price,
+                             select_expirations)
+from strategies import STRATEGIES, find_strategy_type, get_strategy, rank_candidates
+
+# Per-row objects that do not fit a flat table
+NON_COLUMNAR_FIELDS = ('pricing_comparison', 'strategy_type')
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+# -------------------------------
+# Rate-Limited Fetching
+# -------------------------------
+class RateLimiter:
+    """Token bucket shared by the fetch threads: at most `rate` upstream calls per second on average."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+def fetch_ticker(ticker, min_dte, max_dte, limiter, n_expirations=3):
+    """Price and raw chains of the expirations to analyze: (price, {expiration: (calls, puts)})."""
+    limiter.acquire()
+    underlying_price = fetch_underlying_price(ticker)
+    if underlying_price is None:
+        raise ValueError(f"no price data for {ticker}")
+    limiter.acquire()
+    expirations = fetch_expirations(ticker) or ()
+
+    chains = {}
+    for expiration in select_expirations(expirations, min_dte, max_dte, n_expirations):
+        limiter.acquire()
+        chains[expiration] = fetch_option_chain(ticker, expiration)
+    return underlying_price, chains
+
+
+# -------------------------------
+# Ranking (runs in worker processes)
+# -------------------------------
+def rank_ticker(ticker, underlying_price, chains, strategy_types, criteria=None):
+    """Every ranked candidate of every strategy for one ticker, as one flat DataFrame."""
+    cleaned = {expiration: (clean_option_chain(raw_calls, underlying_price, expiration, criteria),
+                            clean_option_chain(raw_puts, underlying_price, expiration, criteria))
+               for expiration, (raw_calls, raw_puts) in chains.items()}
+    frames = []
+    for strategy_type in strategy_types:
+        candidate_frames = []
+        if get_strategy(strategy_type).get('cross_expiration'):
+            candidate_frames.append(evaluate_cross_expiration(strategy_type, cleaned, underlying_price,
+                                                              criteria=criteria))
+        else:
+            # Same-expiration strategies look at the first three expirations, like the API
+            for expiration, (calls, puts) in list(cleaned.items())[:3]:
+                candidate_frames.append(evaluate_strategy(strategy_type, calls, puts, underlying_price, expiration,
+                                                          criteria=criteria))
+        candidate_frames = [df for df in candidate_frames if not df.empty]
+        if not candidate_frames:
+            continue
+
+        ranked = rank_candidates(pd.concat(candidate_frames, ignore_index=True), get_strategy(strategy_type))
+        ranked = ranked.drop(columns=[c for c in NON_COLUMNAR_FIELDS if c in ranked]).reset_index(drop=True)
+        ranked.insert(0, 'ticker', ticker)
+        ranked.insert(1, 'strategy', strategy_type)
+        ranked.insert(2, 'rank', range(1, len(ranked) + 1))
+        ranked['underlying_price'] = underlying_price
+        frames.append(ranked)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+# -------------------------------
+# Checkpointing and Output
+# -------------------------------
+def _parquet_available():
+    """Whether pandas has a Parquet engine (pyarrow or fastparquet); neither is a hard dependency."""
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+def _write_frame(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _read_frame(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+class Checkpoint:
+    """
+    Per-ticker part files plus a manifest of finished tickers. Both are written via a
+    temporary file and os.replace, so an interrupted run never leaves a half-written part.
+    """
+
+    def __init__(self, directory, params, suffix, restart=False):
+        self.directory = directory
+        self.suffix = suffix
+        self.manifest_path = os.path.join(directory, CHECKPOINT_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self.done = {}
+        if os.path.exists(self.manifest_path) and not restart:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['params'] != params:
+                raise SystemExit(f"{directory} holds a batch run with different arguments; "
+                                 f"use --restart to discard it.")
+            self.done = manifest['done']
+        self.params = params
+
+    def part_path(self, ticker):
+        return os.path.join(self.directory, f"{ticker}{self.suffix}")
+
+    def complete(self, ticker, ranked):
+        if not ranked.empty:
+            tmp_path = self.part_path(ticker) + '.tmp' + self.suffix
+            _write_frame(ranked, tmp_path)
+            os.replace(tmp_path, self.part_path(ticker))
+        self.done[ticker] = len(ranked)
+        tmp_manifest = self.manifest_path + '.tmp'
+        with open(tmp_manifest, 'w') as f:
+            json.dump({'params': self.params, 'done': self.done}, f, indent=2)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    def combine(self, tickers):
+        parts = [_read_frame(self.part_path(ticker)) for ticker in tickers if self.done.get(ticker)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+# -------------------------------
+# Batch Driver
+# -------------------------------
+def run_batch(tickers, strategy_types, min_dte, max_dte, out, checkpoint_dir=None, criteria=None, rate=2.0,
+              fetch_threads=4, max_workers=None, restart=False):
+    """
+    Rank every ticker and write all candidates to `out` (.csv or .parquet).
+    Returns (candidates DataFrame, {ticker: error message} for failed tickers).
+    """
+    suffix = '.parquet' if out.endswith('.parquet') else '.csv'
+    params = {'strategies': list(strategy_types), 'min_dte': min_dte, 'max_dte': max_dte,
+              'criteria': criteria or {}}
+    checkpoint = Checkpoint(checkpoint_dir or out + '.checkpoint', params, suffix, restart)
+    pending = [ticker for ticker in tickers if ticker not in checkpoint.done]
+    if len(pending) < len(tickers):
+        logging.info(f"Resuming: {len(tickers) - len(pending)} of {len(tickers)} tickers already done.")
+
+    limiter = RateLimiter(rate)
+    n_expirations = DIAGONAL_MAX_EXPIRATIONS if any(get_strategy(strategy_type).get('cross_expiration')
+                                                    for strategy_type in strategy_types) else 3
+    failed = {}
+    with ThreadPoolExecutor(max_workers=fetch_threads) as fetchers, \
+            ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as rankers:
+        fetching = {fetchers.submit(fetch_ticker, ticker, min_dte, max_dte, limiter, n_expirations): ticker for ticker in pending}
+        ranking = {}
+        while fetching or ranking:
+            finished, _ = wait(list(fetching) + list(ranking), return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in fetching:
+                    ticker = fetching.pop(future)
+                    try:
+                        underlying_price, chains = future.result()
+                    except Exception as e:
+                        failed[ticker] = str(e)
+                        logging.error(f"Fetching {ticker} failed: {e}")
+                        continue
+                    ranking[rankers.submit(rank_ticker, ticker, underlying_price, chains, strategy_types,
+                                           criteria)] = ticker
+                else:
+                    ticker = ranking.pop(future)
+                    try:
+                        ranked = future.result()
+                    except Exception as e:
+                        failed[ticker] = str(e)
+                        logging.error(f"Ranking {ticker} failed: {e}")
+                        continue
+                    checkpoint.complete(ticker, ranked)
+                    logging.info(f"{ticker}: {len(ranked)} candidates "
+                                 f"({len(checkpoint.done)}/{len(tickers)} tickers done)")
+
+    candidates = checkpoint.combine(tickers)
+    _write_frame(candidates, out)
+    return candidates, failed
+
+
+def read_ticker_file(path):
+    """Tickers from a file, one or more per line (comma or whitespace separated); '#' starts a comment."""
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            for ticker in line.split('#', 1)[0].replace(',', ' ').split():
+                if ticker.upper() not in tickers:
+                    tickers.append(ticker.upper())
+    return tickers
+
+
+def _parse_strategies(spec):
+    if spec == 'all':
+        return list(STRATEGIES)
+    strategy_types = []
+    for name in spec.split(','):
+        strategy_type = name if name in STRATEGIES else find_strategy_type(name)
+        if strategy_type is None:
+            raise SystemExit(f"Unknown strategy '{name}'. Choose from: {', '.join(STRATEGIES)}")
+        strategy_types.append(strategy_type)
+    return strategy_types
+
+
+def _parse_criteria(specs):
+    criteria = {}
+    for spec in specs:
+        key, _, value = spec.partition('=')
+        if key not in DEFAULT_CRITERIA:
+            raise SystemExit(f"Unknown criterion '{key}'. Choose from: {', '.join(DEFAULT_CRITERIA)}")
+        criteria[key] = float(value)
+    return criteria or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank option strategies for a list of tickers.")
+    parser.add_argument('ticker_file', help="File with the tickers to analyze")
+    parser.add_argument('--strategies', default='Bullish,Bearish',
+                        help="Comma separated strategy names or ids (see GET /strategies), or 'all'")
+    parser.add_argument('--min-dte', type=int, default=30)
+    parser.add_argument('--max-dte', type=int, default=90)
+    parser.add_argument('--out', required=True, help="Output file, .csv or .parquet")
+    parser.add_argument('--checkpoint-dir', help="Where progress is kept (default: <out>.checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    parser.add_argument('--criteria', action='append', default=[],
+                        help="Screening override key=value, e.g. max_net_cost=5 (repeatable)")
+    parser.add_argument('--rate', type=float, default=2.0, help="Upstream requests per second")
+    parser.add_argument('--fetch-threads', type=int, default=4)
+    parser.add_argument('--workers', type=int, help="Ranking processes (default: all cores)")
+    args = parser.parse_args()
+    if args.out.endswith('.parquet') and not _parquet_available():
+        # Checked up front: otherwise the run would fail only when writing its first part file
+        parser.error("Parquet output needs pyarrow (pip install pyarrow); or write a .csv")
+
+    # The rate limiter replaces the engine's fixed courtesy pauses
+    analysis_engine.UPSTREAM_DELAY_SCALE = 0.0
+    tickers = read_ticker_file(args.ticker_file)
+    started = time.perf_counter()
+    candidates, failed = run_batch(tickers, _parse_strategies(args.strategies), args.min_dte, args.max_dte, args.out,
+                                   args.checkpoint_dir, _parse_criteria(args.criteria), args.rate,
+                                   args.fetch_threads, args.workers, args.restart)
+    print(f"Wrote {len(candidates)} candidates for {len(tickers) - len(failed)} tickers to {args.out} "
+          f"in {time.perf_counter() - started:.1f}s")
+    if failed:
+        print(f"Failed ({len(failed)}): " + ", ".join(f"{ticker} ({error})" for ticker, error in failed.items()))
+
+
+if __name__ == "__main__":
+    main()
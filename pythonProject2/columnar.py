@@ -0,0 +1,176 @@
+"""
+Typed columnar encodings of ranked candidates.
+
+The JSON responses carry every number as JSON text, and the report table as formatted
+strings ("$22.50/$17.50", "$0.20 DB") that clients have to parse again. Clients that want
+the ranked candidates themselves can ask for them, via the Accept header, as
+
+    application/vnd.vegaedge.columns      compact binary of typed column buffers (numpy only)
+    application/vnd.apache.arrow.stream   Arrow IPC stream (needs pyarrow)
+
+with application/json staying the default.
+
+application/vnd.vegaedge.columns layout (integers little-endian):
+    b'VGC1'          magic
+    uint32           length of the header
+    header           UTF-8 JSON: {"meta": {...}, "rows": n, "columns": [{"name", "type",
+                     "offset", "nbytes"} ...]}
+    zero padding     up to a multiple of 8 bytes
+    column buffers   each at (start of the buffers + offset), 8-byte aligned
+
+Column types: "f8" float64, "i8" int64, "u1" bool (0/1), and "dict" for strings such as
+the expiration: uint32 codes into the column's "values" list in the header.
+decode_columns() reads the format back.
+"""
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNS_MEDIA_TYPE = 'application/vnd.vegaedge.columns'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+COLUMNS_MAGIC = b'VGC1'
+ALIGNMENT = 8
+
+
+def _arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_media_types():
+    """Supported response types, in the server's order of preference."""
+    media_types = [JSON_MEDIA_TYPE, COLUMNS_MEDIA_TYPE]
+    if _arrow_available():
+        media_types.append(ARROW_MEDIA_TYPE)
+    return media_types
+
+
+# -------------------------------
+# Content Negotiation
+# -------------------------------
+def _parse_accept(accept):
+    """[(media_range, q)] of an Accept header."""
+    ranges = []
+    for part in accept.split(','):
+        media_range, *params = [item.strip() for item in part.split(';')]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges.append((media_range.lower(), q))
+    return ranges
+
+
+def negotiate(accept):
+    """
+    The response type for an Accept header: the supported type with the highest q value,
+    ties going to the server's preference (JSON first). None when nothing acceptable is
+    supported (answer 406). No header means JSON.
+    """
+    if not accept or not accept.strip():
+        return JSON_MEDIA_TYPE
+    ranges = _parse_accept(accept)
+    best, best_q = None, 0.0
+    for media_type in available_media_types():
+        kind = media_type.split('/')[0]
+        # The most specific matching range decides the q value
+        matches = [(3 if media_range == media_type else 2 if media_range == f'{kind}/*' else 1, q)
+                   for media_range, q in ranges if media_range in (media_type, f'{kind}/*', '*/*')]
+        if not matches:
+            continue
+        q = max(matches)[1]
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+# -------------------------------
+# Encoding
+# -------------------------------
+def _column_buffer(values):
+    """(type, bytes, extra header fields) of one column."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        return 'f8', values.astype('<f8', copy=False).tobytes(), {}
+    if values.dtype.kind in 'iu':
+        return 'i8', values.astype('<i8', copy=False).tobytes(), {}
+    if values.dtype.kind == 'b':
+        return 'u1', values.astype('u1').tobytes(), {}
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return 'dict', codes.astype('<u4').tobytes(), {'values': [None if pd.isna(value) else value for value in uniques]}
+
+
+def encode_columns(columns, meta=None):
+    """application/vnd.vegaedge.columns payload for equally long `columns` (name -> array)."""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    buffers, descriptors, offset = [], [], 0
+    for name, values in columns.items():
+        column_type, data, extra = _column_buffer(values)
+        descriptors.append({'name': name, 'type': column_type, 'offset': offset, 'nbytes': len(data), **extra})
+        padding = -len(data) % ALIGNMENT
+        buffers.append(data + b'\0' * padding)
+        offset += len(data) + padding
+    header = json.dumps({'meta': meta or {}, 'rows': rows, 'columns': descriptors},
+                        separators=(',', ':'), default=str).encode('utf-8')
+    prefix_length = len(COLUMNS_MAGIC) + 4 + len(header)
+    return b''.join([COLUMNS_MAGIC, struct.pack('<I', len(header)), header,
+                     b'\0' * (-prefix_length % ALIGNMENT)] + buffers)
+
+
+def decode_columns(payload):
+    """(meta, {name: numpy array}) of an application/vnd.vegaedge.columns payload."""
+    if payload[:len(COLUMNS_MAGIC)] != COLUMNS_MAGIC:
+        raise ValueError("not an application/vnd.vegaedge.columns payload")
+    header_length, = struct.unpack_from('<I', payload, len(COLUMNS_MAGIC))
+    header_start = len(COLUMNS_MAGIC) + 4
+    header = json.loads(payload[header_start:header_start + header_length])
+    data_start = header_start + header_length
+    data_start += -data_start % ALIGNMENT
+    rows, columns = header['rows'], {}
+    for column in header['columns']:
+        start = data_start + column['offset']
+        if column['type'] == 'dict':
+            codes = np.frombuffer(payload, dtype='<u4', count=rows, offset=start)
+            columns[column['name']] = np.array(column['values'], dtype=object)[codes]
+        elif column['type'] == 'u1':
+            columns[column['name']] = np.frombuffer(payload, dtype='u1', count=rows, offset=start).astype(bool)
+        else:
+            columns[column['name']] = np.frombuffer(payload, dtype=f"<{column['type']}", count=rows, offset=start)
+    return header['meta'], columns
+
+
+def encode_arrow(columns, meta=None):
+    """Arrow IPC stream of `columns`, with `meta` as JSON under the schema metadata key 'vegaedge'."""
+    import pyarrow as pa
+
+    arrays = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        arrays[name] = pa.array(values) if values.dtype.kind in 'fiub' else pa.array(values.tolist()).dictionary_encode()
+    table = pa.table(arrays).replace_schema_metadata({'vegaedge': json.dumps(meta or {}, default=str)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(media_type, columns, meta=None):
+    """Bytes of `columns` and `meta` in one of the binary media types."""
+    if media_type == COLUMNS_MEDIA_TYPE:
+        return encode_columns(columns, meta)
+    if media_type == ARROW_MEDIA_TYPE:
+        return encode_arrow(columns, meta)
+    raise ValueError(f"unsupported media type {media_type}")
@@ -0,0 +1,171 @@
+"""
+Shared upstream data client.
+
+Every analysis used to build fresh `yf.Ticker` objects, and each one repeated the
+metadata lookups (expiration list) the previous one had already done. DataClient keeps
+one keep-alive HTTP session, i.e. one connection pool, for all Yahoo Finance traffic of
+the process, shared by every request and thread, plus a bounded LRU of Ticker handles.
+It counts how often connections and handles are reused (see `stats()`).
+
+The session is a curl_cffi session, as yfinance itself uses (curl_cffi is one of its
+dependencies, and Yahoo's bot checks turn plain requests sessions away). `get(url)` goes
+through the same session, which is how pooling is checked against a local stub server
+(test_data_client.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+HTTP_TIMEOUT = 30
+TICKER_HANDLE_CACHE_SIZE = 256
+# A handle caches its ticker's expiration list, so it is not kept longer than that list
+TICKER_HANDLE_TTL = 30 * 60
+
+
+# -------------------------------
+# Pooled Session
+# -------------------------------
+def _new_curl_session(counter):
+    from curl_cffi import requests as curl_requests
+
+    class PooledCurlSession(curl_requests.Session):
+        """
+        curl_cffi session counting the connections it opened. libcurl keeps each thread's
+        connections alive between transfers; a transfer over a local/remote address pair
+        not seen before is a new connection.
+        """
+        RECENT_CONNECTIONS = 1024
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._connections = OrderedDict()
+            self._connections_lock = threading.Lock()
+            self._opened = 0
+
+        def request(self, method, url, *args, **kwargs):
+            response = super().request(method, url, *args, **kwargs)
+            endpoint = (response.local_ip, response.local_port, response.primary_ip, response.primary_port)
+            with self._connections_lock:
+                if endpoint in self._connections:
+                    self._connections.move_to_end(endpoint)
+                else:
+                    self._opened += 1
+                    self._connections[endpoint] = True
+                    if len(self._connections) > self.RECENT_CONNECTIONS:
+                        self._connections.popitem(last=False)
+            counter()
+            return response
+
+        def connections_opened(self):
+            return self._opened
+
+    return PooledCurlSession(impersonate='chrome')
+
+
+# -------------------------------
+# Data Client
+# -------------------------------
+class DataClient:
+    """
+    Pooled session plus Ticker handle cache. `provider` is anything exposing
+    `Ticker(symbol, session=...)`: the yfinance module, or loadtest.FakeChainProvider.
+    """
+
+    def __init__(self, provider, handle_cache_size=TICKER_HANDLE_CACHE_SIZE, handle_ttl=TICKER_HANDLE_TTL):
+        self.provider = provider
+        self.handle_cache_size = handle_cache_size
+        self.handle_ttl = handle_ttl
+        self._session = None
+        self._handles = OrderedDict()  # symbol -> (handle, created_at)
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.http_requests = 0
+        self.handle_hits = 0
+        self.handle_misses = 0
+        self.handle_evictions = 0
+        self.handle_expired = 0
+
+    # --- Session ---
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = _new_curl_session(self._count_request)
+            return self._session
+
+    def _count_request(self):
+        with self._lock:
+            self.http_requests += 1
+
+    def get(self, url, **kwargs):
+        """GET through the shared session (used to check pooling against a stub server)."""
+        kwargs.setdefault('timeout', HTTP_TIMEOUT)
+        return self.session.get(url, **kwargs)
+
+    # --- Ticker handles ---
+    def ticker(self, symbol, fresh=False):
+        """
+        The cached Ticker handle for `symbol`, or a new one when missing, older than
+        `handle_ttl` or `fresh` is set (e.g. to re-read the expiration list).
+        """
+        key = symbol.upper()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and not fresh:
+                if now - entry[1] < self.handle_ttl:
+                    self._handles.move_to_end(key)
+                    self.handle_hits += 1
+                    return entry[0]
+                self.handle_expired += 1
+        handle = self.provider.Ticker(symbol, session=self.session)
+        with self._lock:
+            self.handle_misses += 1
+            self._handles[key] = (handle, now)
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.handle_cache_size:
+                self._handles.popitem(last=False)
+                self.handle_evictions += 1
+        return handle
+
+    # --- Lifecycle and metrics ---
+    def reset(self, provider=None):
+        """Drop the session, handles and counters; optionally switch the provider."""
+        with self._lock:
+            session, self._session = self._session, None
+            self._handles.clear()
+            self._reset_counters()
+            if provider is not None:
+                self.provider = provider
+        if session is not None:
+            session.close()
+
+    def close(self):
+        self.reset()
+
+    def stats(self):
+        with self._lock:
+            session = self._session
+            http_requests = self.http_requests
+            handles = {
+                'size': len(self._handles),
+                'capacity': self.handle_cache_size,
+                'hits': self.handle_hits,
+                'misses': self.handle_misses,
+                'evictions': self.handle_evictions,
+                'expired': self.handle_expired,
+            }
+        new_connections = session.connections_opened() if session is not None else 0
+        lookups = handles['hits'] + handles['misses']
+        handles['hit_ratio'] = round(handles['hits'] / lookups, 3) if lookups else None
+        return {
+            'http': {
+                'requests': http_requests,
+                'connections_opened': new_connections,
+                'connections_reused': max(0, http_requests - new_connections),
+                'reuse_ratio': round(1 - new_connections / http_requests, 3) if http_requests else None,
+            },
+            'ticker_handles': handles,
+        }
@@ -0,0 +1,317 @@
+"""
+Offline load-test harness for backend_api.py.
+
+Boots the FastAPI app in-process with uvicorn, swaps the Yahoo Finance client in
+analysis_engine for a local fake chain provider (synthetic chains of configurable
+size with artificial upstream latency), then drives a configurable concurrent mix
+of analyze requests and reports throughput and latency percentiles. Nothing
+touches the network besides the loopback interface.
+
+Usage:
+    python loadtest.py --concurrency 16 --requests 400 --mix bullish=2,bearish=1 \\
+        --hot-tickers 5 --hot-ratio 0.8 --strikes 60 --expirations 8 --latency-ms 80
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+import analysis_engine
+
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+
+# -------------------------------
+# Fake Chain Provider
+# -------------------------------
+class FakeChainProvider:
+    """
+    Stand-in for the `yfinance` module: exposes `Ticker(symbol)` with `history`,
+    `options` and `option_chain`. Chains are synthetic but deterministic per ticker,
+    and every upstream call sleeps for `latency_ms` (+ uniform `jitter_ms`).
+    """
+
+    def __init__(self, strikes=40, expirations=6, latency_ms=50.0, jitter_ms=0.0, seed=0):
+        self.strikes = strikes
+        self.expirations = expirations
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.seed = seed
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+        self._chains = {}
+
+    def Ticker(self, symbol, session=None):
+        return _FakeTicker(self, symbol.upper())
+
+    def upstream_call(self):
+        with self._lock:
+            self.upstream_calls += 1
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def chain_for(self, symbol):
+        with self._lock:
+            if symbol not in self._chains:
+                self._chains[symbol] = self._generate(symbol)
+            return self._chains[symbol]
+
+    def _generate(self, symbol):
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()) + self.seed)
+        price = float(rng.uniform(20, 500))
+        today = datetime.now().date()
+        expirations = [(today + timedelta(days=14 + 30 * i)).strftime('%Y-%m-%d') for i in range(self.expirations)]
+        strikes = np.round(np.linspace(price * 0.5, price * 1.5, self.strikes), 1)
+
+        chains = {}
+        for i, expiration in enumerate(expirations):
+            T = (14 + 30 * i) / 365.0
+            frames = []
+            for option_type in ('call', 'put'):
+                iv = np.clip(0.3 + 0.4 * np.abs(np.log(strikes / price)) + rng.normal(0, 0.03, len(strikes)), 0.05, 3)
+                d1 = (np.log(price / strikes) + 0.5 * iv ** 2 * T) / (iv * np.sqrt(T))
+                d2 = d1 - iv * np.sqrt(T)
+                if option_type == 'call':
+                    fair = price * norm.cdf(d1) - strikes * norm.cdf(d2)
+                else:
+                    fair = strikes * norm.cdf(-d2) - price * norm.cdf(-d1)
+                fair = np.maximum(fair, 0.05)
+                half_spread = fair * rng.uniform(0.01, 0.15, len(strikes))
+                frames.append(pd.DataFrame({
+                    'contractSymbol': [f"{symbol}{expiration}{option_type[0].upper()}{k}" for k in strikes],
+                    'strike': strikes,
+                    'lastPrice': np.round(fair, 2),
+                    'bid': np.round(np.maximum(fair - half_spread, 0.01), 2),
+                    'ask': np.round(fair + half_spread, 2),
+                    'volume': rng.integers(0, 500, len(strikes)),
+                    'openInterest': rng.integers(0, 5000, len(strikes)),
+                    'impliedVolatility': iv,
+                    'inTheMoney': strikes < price if option_type == 'call' else strikes > price,
+                }))
+            chains[expiration] = OptionChain(*frames)
+        return {'price': price, 'expirations': tuple(expirations), 'chains': chains}
+
+
+class _FakeTicker:
+    def __init__(self, provider, symbol):
+        self._provider = provider
+        self._symbol = symbol
+
+    def history(self, period='1d'):
+        self._provider.upstream_call()
+        return pd.DataFrame({'Close': [self._provider.chain_for(self._symbol)['price']]})
+
+    @property
+    def options(self):
+        self._provider.upstream_call()
+        return self._provider.chain_for(self._symbol)['expirations']
+
+    def option_chain(self, expiration):
+        self._provider.upstream_call()
+        chain = self._provider.chain_for(self._symbol)['chains'][expiration]
+        return OptionChain(chain.calls.copy(), chain.puts.copy())
+
+
+def install_fake_provider(provider, keep_gentle_delays=False):
+    """Route analysis_engine's upstream calls to `provider`."""
+    analysis_engine.yf = provider
+    analysis_engine.data_client.reset(provider)
+    if not keep_gentle_delays:
+        analysis_engine.UPSTREAM_DELAY_SCALE = 0.0
+
+
+# -------------------------------
+# Server and Load Driver
+# -------------------------------
+def start_server(port=None):
+    """Run backend_api.app with uvicorn on a background thread. Returns (server, port)."""
+    import uvicorn
+    import backend_api
+
+    if port is None:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(backend_api.app, host='127.0.0.1', port=port, log_level='warning',
+                                           access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+def _path_for(strategy_id):
+    if strategy_id in ('bullish', 'bearish'):
+        return f"/analyze/{strategy_id}"
+    return f"/analyze/strategies/{strategy_id}"
+
+
+def build_request_factory(mix, hot_tickers, hot_ratio, min_dte, max_dte, seed=0):
+    """Returns a thread-safe function producing (label, path, body) for the next request."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    strategies, weights = zip(*mix.items())
+    cold_counter = [0]
+
+    def next_request():
+        with lock:
+            strategy_id = rng.choices(strategies, weights)[0]
+            if rng.random() < hot_ratio:
+                temperature, ticker = 'hot', f"HOT{rng.randrange(hot_tickers)}"
+            else:
+                cold_counter[0] += 1
+                temperature, ticker = 'cold', f"COLD{cold_counter[0]}"
+        body = {'ticker': ticker, 'min_dte': min_dte, 'max_dte': max_dte}
+        return f"{strategy_id}/{temperature}", _path_for(strategy_id), body
+
+    return next_request
+
+
+def analysis_succeeded(status, body):
+    """
+    Whether an analyze response holds a ranking. The API reports failed analyses as 200
+    with an "Analysis Error" summary and no analysis id; the synthetic chains always have
+    candidates, so a response without an analysis id is an error too.
+    """
+    if status != 200:
+        return False
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    summary = payload.get('result', {}).get('summary', '')
+    return bool(payload.get('analysis_id')) and not summary.startswith('Analysis Error')
+
+
+def run_load(port, next_request, concurrency, total_requests=None, duration=None, timeout=120):
+    """
+    Drive the API from `concurrency` keep-alive clients until `total_requests` have been
+    sent or `duration` seconds have passed. Returns (samples, elapsed) where samples are
+    (label, latency_seconds, ok) tuples.
+    """
+    samples = []
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def claim():
+        with samples_lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        while (deadline is None or time.perf_counter() < deadline) and claim():
+            label, path, body = next_request()
+            started = time.perf_counter()
+            try:
+                conn.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                ok = analysis_succeeded(response.status, response.read())
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                ok = False
+            with samples_lock:
+                samples.append((label, time.perf_counter() - started, ok))
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """Throughput and latency percentiles (ms), overall and per request class."""
+    groups = defaultdict(list)
+    for label, latency, ok in samples:
+        groups['all'].append((latency, ok))
+        groups[label].append((latency, ok))
+
+    rows = []
+    for label in ['all'] + sorted(key for key in groups if key != 'all'):
+        latencies = np.array([latency for latency, _ in groups[label]]) * 1000
+        p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+        rows.append({'class': label, 'requests': len(latencies),
+                     'errors': sum(1 for _, ok in groups[label] if not ok),
+                     'throughput_rps': len(latencies) / elapsed, 'p50_ms': p50, 'p90_ms': p90, 'p95_ms': p95,
+                     'p99_ms': p99, 'max_ms': latencies.max()})
+    return rows
+
+
+def _parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the VegaEdge API.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="Total requests (ignored when --duration is set)")
+    parser.add_argument('--duration', type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument('--warmup', type=int, default=0, help="Requests sent before measuring")
+    parser.add_argument('--mix', default='bullish=1,bearish=1',
+                        help="Strategy ids with relative weights, e.g. bullish=2,bearish=1,iron-condor=0.5")
+    parser.add_argument('--hot-tickers', type=int, default=5)
+    parser.add_argument('--hot-ratio', type=float, default=0.8, help="Share of requests for hot tickers")
+    parser.add_argument('--min-dte', type=int, default=0)
+    parser.add_argument('--max-dte', type=int, default=120)
+    parser.add_argument('--strikes', type=int, default=40, help="Strikes per expiration in the fake chains")
+    parser.add_argument('--expirations', type=int, default=6)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Artificial latency per upstream call")
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--keep-gentle-delays', action='store_true',
+                        help="Keep the engine's courtesy pauses between upstream calls")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the summary rows to this file")
+    args = parser.parse_args()
+
+    provider = FakeChainProvider(args.strikes, args.expirations, args.latency_ms, args.jitter_ms, args.seed)
+    install_fake_provider(provider, args.keep_gentle_delays)
+    server, port = start_server()
+
+    next_request = build_request_factory(_parse_mix(args.mix), args.hot_tickers, args.hot_ratio, args.min_dte,
+                                         args.max_dte, args.seed)
+    if args.warmup:
+        run_load(port, next_request, args.concurrency, total_requests=args.warmup)
+    upstream_before = provider.upstream_calls
+    samples, elapsed = run_load(port, next_request, args.concurrency,
+                                total_requests=None if args.duration else args.requests, duration=args.duration)
+    server.should_exit = True
+
+    rows = summarize(samples, elapsed)
+    print(f"{len(samples)} requests in {elapsed:.2f}s at concurrency {args.concurrency} "
+          f"({provider.upstream_calls - upstream_before} upstream calls)")
+    print(f"{'class':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for row in rows:
+        print(f"{row['class']:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+              f"{row['max_ms']:>9.1f}")
+    print("(latencies in ms)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'elapsed_s': elapsed, 'concurrency': args.concurrency, 'rows': rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
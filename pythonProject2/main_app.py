@@ -1,12 +1,18 @@
+import time # For simulation of analysis time
+_process_started = time.perf_counter()
 import customtkinter as ctk
 import threading
-import time # For simulation of analysis time
-from PIL import Image, ImageTk, ImageFilter
+import queue
+from PIL import Image, ImageTk, ImageFilter, ImageDraw, ImageFont
 import tkinter as tk
 import os
 import sys
-# Import the real analysis engine
-from analysis_engine import run_bullish_analysis, run_bearish_analysis
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+# The analysis engine (yfinance, pandas, scipy) is imported in the background once the
+# window is up, see get_engine. numpy is only imported by functions running off the Tk thread.
 
 # Set appearance mode and color theme
 ctk.set_appearance_mode("dark")
@@ -18,6 +24,25 @@ ACCENT_BLUE = "#1fa2ff"     # Blue gradient from logo
 ACCENT_GREEN = "#23d160"    # Green gradient from logo
 TEXT_WHITE = "#ffffff"
 TEXT_GRAY = "#bfc9d1"
+TABLE_BG = "#232b3a"
+TABLE_STRIPE = "#1d2431"
+
+# Ranked results table: (column key, header, relative width)
+RESULT_COLUMNS = [
+    ("rank", "Rank", 0.6),
+    ("expiration", "Expiration", 1.1),
+    ("strikes", "Strikes", 1.6),
+    ("net_cost", "Net Cost", 1.1),
+    ("net_delta", "Net Delta", 0.9),
+    ("net_vega", "Net Vega", 0.9),
+    ("efficiency", "Efficiency", 0.9),
+    ("total_score", "Score", 0.8),
+]
+
+# Time-to-first-window budget in ms; a slower launch is flagged in the startup timeline
+FIRST_WINDOW_TARGET_MS = float(os.environ.get("VEGAEDGE_FIRST_WINDOW_TARGET_MS", "1500"))
+# --startup-timeline gives up (and fails) when the window or the engine isn't there by then
+STARTUP_CHECK_TIMEOUT_MS = 60000
 
 def resource_path(relative_path):
     # Get absolute path to resource, works for dev and for PyInstaller .exe
@@ -25,49 +50,208 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+# --- Startup Timeline ---
+class StartupTimeline:
+    """
+    Milliseconds from the start of main_app's imports to each startup milestone
+    (time spent by the PyInstaller bootloader before Python starts is not included).
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.started) * 1000
+
+    def over_target(self):
+        """True when the first window took longer than the target or never opened."""
+        first_window = self.marks.get("first_window")
+        return first_window is None or first_window > FIRST_WINDOW_TARGET_MS
+
+    def summary(self):
+        steps = " | ".join(f"{name} {ms:.0f}ms" for name, ms in sorted(self.marks.items(), key=lambda item: item[1]))
+        if "first_window" not in self.marks:
+            verdict = "NO FIRST WINDOW"
+        else:
+            verdict = "OVER TARGET" if self.over_target() else "within target"
+        return f"Startup: {steps} (first window target {FIRST_WINDOW_TARGET_MS:.0f}ms, {verdict})"
+
+startup_timeline = StartupTimeline(_process_started)
+
+# --- Background Engine Import ---
+_engine = None
+_engine_error = None
+_engine_loaded = threading.Event()
+_engine_thread = None
+_engine_lock = threading.Lock()
+
+def start_engine_import():
+    """Import analysis_engine on a background thread (once)."""
+    global _engine_thread
+    with _engine_lock:
+        if _engine_thread is None:
+            _engine_thread = threading.Thread(target=_import_engine, name="engine-import", daemon=True)
+            _engine_thread.start()
+
+def _import_engine():
+    global _engine, _engine_error
+    try:
+        import analysis_engine
+        _engine = analysis_engine
+        startup_timeline.mark("engine")
+    except Exception as e:
+        _engine_error = e
+    finally:
+        _engine_loaded.set()
+
+def engine_ready():
+    return _engine_loaded.is_set()
+
+def get_engine():
+    """The analysis_engine module, waiting for the background import if it is still running."""
+    start_engine_import()
+    _engine_loaded.wait()
+    if _engine is None:
+        raise RuntimeError(f"Analysis engine failed to load: {_engine_error}")
+    return _engine
+
+# --- Cached Image Assets ---
+def asset_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("VEGAEDGE_ASSET_CACHE") or os.path.join(base, "VegaEdge", "assets")
+
+def load_resized_image(relative_path, size):
+    """
+    The image at `relative_path` resized to `size` (RGBA). The resized copy is cached on
+    disk under the source's checksum, so later launches skip decoding and resampling the
+    full-size original.
+    """
+    source = resource_path(relative_path)
+    with open(source, "rb") as f:
+        checksum = zlib.crc32(f.read())
+    name = os.path.splitext(os.path.basename(relative_path))[0]
+    cached = os.path.join(asset_cache_dir(), f"{name}-{size[0]}x{size[1]}-{checksum:08x}.png")
+    try:
+        with Image.open(cached) as img:
+            return img.convert("RGBA")
+    except OSError:
+        pass
+    img = Image.open(source).convert("RGBA")
+    Resampling = getattr(Image, "Resampling", Image)
+    resample_filter = getattr(Resampling, "LANCZOS", getattr(Resampling, "BICUBIC"))
+    img = img.resize(size, resample_filter)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        img.save(cached + ".tmp", "PNG")
+        os.replace(cached + ".tmp", cached)
+    except OSError:
+        pass  # No writable cache directory; resize again next launch
+    return img
+
+@lru_cache(maxsize=8)
+def _watermark_font(size):
+    for name in ("segoeuib.ttf", "DejaVuSans-Bold.ttf", "Arial Bold.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+def render_gradient(w, h):
+    """
+    The background as one RGB image: blue-green gradient, faint "VE" watermark and the
+    translucent wave (the same design the canvas used to draw line by line).
+    """
+    column = bytes(c for i in range(h) for c in (int(16 + (31-16)*i/h), int(19 + (162-19)*i/h), int(26 + (255-26)*i/h)))
+    Resampling = getattr(Image, "Resampling", Image)
+    img = Image.frombytes("RGB", (1, h), column).resize((w, h), Resampling.NEAREST)
+    # Faint "VE" watermark, blended through a mask (text drawing ignores fill alpha)
+    font = _watermark_font(max(1, int(h * 0.25 * 4 / 3)))  # 0.25*h points, in pixels
+    left, top, right, bottom = font.getbbox("VE")
+    mask = Image.new("L", (right - left, bottom - top))
+    ImageDraw.Draw(mask).text((-left, -top), "VE", font=font, fill=0x10)
+    img.paste((255, 255, 255), ((w - (right - left)) // 2, (h - (bottom - top)) // 2), mask)
+    # Flowing wave (abstract): upper half of a wide ellipse
+    ImageDraw.Draw(img, "RGBA").pieslice((-w//2, h//2, w*1.5, h*1.5), 180, 360, fill=(0x23, 0xd1, 0x60, 0x22))
+    return img
+
 class GradientBackground(tk.Canvas):
+    """
+    Renders the background once per size bucket into an image and caches it. While the
+    window is being resized, a cached bucket is swapped in right away; otherwise the
+    render waits until <Configure> events have settled for SETTLE_MS.
+    """
+    BUCKET = 64  # px; sizes are rounded up, the canvas clips the overhang
+    SETTLE_MS = 150
+    CACHE_SIZE = 6
+
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
-        self.bind("<Configure>", self._draw_gradient)
-
-    def _draw_gradient(self, event=None):
-        self.delete("all")
-        w = self.winfo_width()
-        h = self.winfo_height()
-        # Blue-green flowing gradient
-        for i in range(h):
-            r = int(16 + (31-16)*i/h)
-            g = int(19 + (162-19)*i/h)
-            b = int(26 + (255-26)*i/h)
-            color = f"#{r:02x}{g:02x}{b:02x}"
-            self.create_line(0, i, w, i, fill=color)
-        # Faint "VE" watermark
-        self.create_text(w//2, h//2, text="VE", font=("Segoe UI", int(h*0.25), "bold"), fill="#ffffff10")
-        # Optional: flowing wave (abstract)
-        self.create_arc(-w//2, h//2, w*1.5, h*1.5, start=0, extent=180, fill="#23d16022", outline="")
+        self._images = OrderedDict()  # (w, h) bucket -> PhotoImage
+        self._image_item = self.create_image(0, 0, anchor="nw")
+        self._pending = None
+        self.bind("<Configure>", self._on_configure)
+
+    def _bucket(self, w, h):
+        return (-(-w // self.BUCKET) * self.BUCKET, -(-h // self.BUCKET) * self.BUCKET)
+
+    def _on_configure(self, event=None):
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+            self._pending = None
+        bucket = self._bucket(self.winfo_width(), self.winfo_height())
+        if bucket in self._images:
+            self._show(bucket)
+        else:
+            self._pending = self.after(self.SETTLE_MS, self._draw_gradient)
+
+    def _draw_gradient(self):
+        self._pending = None
+        w, h = self.winfo_width(), self.winfo_height()
+        if w <= 1 or h <= 1:
+            return
+        bucket = self._bucket(w, h)
+        if bucket not in self._images:
+            self._images[bucket] = ImageTk.PhotoImage(render_gradient(*bucket))
+            while len(self._images) > self.CACHE_SIZE:
+                self._images.popitem(last=False)
+        self._show(bucket)
+
+    def _show(self, bucket):
+        self._images.move_to_end(bucket)
+        self.itemconfigure(self._image_item, image=self._images[bucket])
 
 # --- Live Analysis Engine Function ---
-def live_analysis_engine_run(ticker, min_dte, max_dte, strategy_type):
+def live_analysis_engine_run(ticker, min_dte, max_dte, strategy_type, tracker=None):
     """
     The real analysis engine function that calls your live analysis code.
+    Besides the parsed report sections, the result carries every ranked candidate as
+    a results table (see build_results_table). `tracker` carries the job's progress
+    callback and cancel event; AnalysisCancelled is passed on to the caller.
     """
     print(f"Running analysis: {ticker}, {min_dte}, {max_dte}, {strategy_type}")
+    engine = get_engine()
     try:
-        if strategy_type == "Bullish":
-            result_text = run_bullish_analysis(ticker, min_dte, max_dte)
-        else:  # Bearish
-            result_text = run_bearish_analysis(ticker, min_dte, max_dte)
+        result_text, ranked_results = engine.run_ranked_analysis(ticker, min_dte, max_dte, strategy_type, tracker=tracker)
         print("Result text:", result_text)
         sections = parse_analysis_result(result_text)
         print("Parsed sections:", sections)
+        if tracker is not None:
+            tracker.progress('table', "Preparing results table...", 0.98)
+        sections["table"] = build_results_table(ranked_results) if ranked_results is not None else None
         return sections
+    except engine.AnalysisCancelled:
+        raise
     except Exception as e:
         print("Error in analysis:", e)
         return {
             "summary": f"Analysis Error: {str(e)}",
             "risk": "",
             "pricing_comparison": "",
-            "top_5": []
+            "top_5": [],
+            "table": None
         }
 
 def parse_analysis_result(result_text):
@@ -133,12 +317,342 @@ def parse_analysis_result(result_text):
         "top_5": top_5_data
     }
 
+# --- Analysis Jobs ---
+class AnalysisJobRunner:
+    """
+    Runs one analysis at a time for the GUI on a worker thread. Starting a job cancels
+    the running one: its cancel event is set and it stops at the engine's next stage
+    boundary (between fetches and expirations), and its late events are dropped.
+    Workers only put events on a queue; the Tk thread drains it with after(), so no
+    Tk call is ever made off the Tk thread. `on_event(kind, payload)` gets
+    ("progress", (stage, message, fraction)), ("done", result_data),
+    ("cancelled", None) or ("error", message).
+    """
+    POLL_MS = 50
+
+    def __init__(self, widget, on_event, run=live_analysis_engine_run):
+        self.widget = widget
+        self.on_event = on_event
+        self.run = run
+        self.events = queue.Queue()
+        self.job_id = 0
+        self._cancel_event = None
+        self._threads = []
+        self._polling = False
+
+    @property
+    def running(self):
+        return self._cancel_event is not None
+
+    def submit(self, ticker, min_dte, max_dte, strategy_type):
+        self.cancel()
+        self.job_id += 1
+        self._cancel_event = threading.Event()
+        thread = threading.Thread(target=self._run_job, name=f"analysis-{self.job_id}", daemon=True,
+                                  args=(self.job_id, self._cancel_event, ticker, min_dte, max_dte, strategy_type))
+        thread.start()
+        self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+        return self.job_id
+
+    def cancel(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+    def active_threads(self):
+        """Worker threads still running, including cancelled ones that have not reached a checkpoint yet."""
+        self._threads = [t for t in self._threads if t.is_alive()]
+        return len(self._threads)
+
+    def _run_job(self, job_id, cancel_event, ticker, min_dte, max_dte, strategy_type):
+        def on_progress(stage, message, fraction):
+            self.events.put((job_id, "progress", (stage, message, fraction)))
+
+        engine = None
+        try:
+            if not engine_ready():
+                on_progress("startup", "Loading analysis engine...", 0.0)
+            engine = get_engine()
+            tracker = engine.StageTracker(cancel_event=cancel_event, on_progress=on_progress)
+            # For debugging, swap in dummy_analysis_engine_run (via `run`) to skip the live engine
+            result_data = self.run(ticker, min_dte, max_dte, strategy_type, tracker=tracker)
+            tracker.check_cancelled()
+            self.events.put((job_id, "done", result_data))
+        except Exception as e:
+            if engine is not None and isinstance(e, engine.AnalysisCancelled):
+                self.events.put((job_id, "cancelled", None))
+            else:
+                self.events.put((job_id, "error", str(e)))
+
+    def _poll(self):
+        while True:
+            try:
+                job_id, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if job_id != self.job_id:
+                continue  # From a superseded job
+            if kind != "progress":
+                self._cancel_event = None
+            self.on_event(kind, payload)
+        if self.running or self.active_threads():
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+
+# --- Ranked Results Table ---
+def build_results_table(ranked_results):
+    """
+    Column arrays for ResultsTable from the ranked candidates DataFrame: the cell texts
+    are formatted once here (on the analysis thread), sort keys stay numeric.
+    """
+    import numpy as np
+    n = len(ranked_results)
+    strike_columns = [c for c in ranked_results.columns if c.endswith("_strike")]
+    strikes = ranked_results[strike_columns].to_numpy(dtype=float)
+    net_cost = ranked_results["net_cost"].to_numpy(dtype=float)
+    net_delta = ranked_results["net_delta"].to_numpy(dtype=float)
+    net_vega = ranked_results["net_vega"].to_numpy(dtype=float)
+    efficiency = ranked_results["efficiency"].to_numpy(dtype=float)
+    total_score = ranked_results["total_score"].to_numpy(dtype=float)
+    expiration = ranked_results["expiration"].astype(str).to_numpy()
+
+    text = {
+        "rank": [str(i + 1) for i in range(n)],
+        "expiration": list(expiration),
+        "strikes": ["/".join(f"${k:.2f}" for k in row) for row in strikes],
+        "net_cost": [f"${abs(c):.2f} {'CR' if c < 0 else 'DB'}" for c in net_cost],
+        "net_delta": [f"{d:.3f}" for d in net_delta],
+        "net_vega": [f"{v:.3f}" for v in net_vega],
+        "efficiency": [f"{e:.1%}" for e in efficiency],
+        "total_score": [f"{s:.3f}" for s in total_score],
+    }
+    return {
+        "size": n,
+        "text": {key: np.array(values, dtype=object) for key, values in text.items()},
+        # Strikes sort by the first leg, expirations by date (ISO strings sort correctly)
+        "sort": {
+            "rank": np.arange(n), "expiration": expiration, "strikes": strikes[:, 0] if n else strikes,
+            "net_cost": net_cost, "net_delta": net_delta, "net_vega": net_vega,
+            "efficiency": efficiency, "total_score": total_score,
+        },
+        "search": np.char.lower(np.array([f"{e} {k} {c}" for e, k, c in
+                                          zip(text["expiration"], text["strikes"], text["net_cost"])], dtype=str)),
+    }
+
+
+def compute_table_view(table, sort_key, descending, query):
+    """
+    Row order to display: rows whose search text contains every word of `query`,
+    stably sorted by `sort_key`. Runs on the table's worker thread.
+    """
+    import numpy as np
+    index = np.arange(table["size"])
+    if query:
+        mask = np.ones(table["size"], dtype=bool)
+        for word in query.lower().split():
+            mask &= np.char.find(table["search"], word) >= 0
+        index = index[mask]
+    values = table["sort"][sort_key][index]
+    if descending:
+        # Reverse-sort while keeping ties in rank order
+        order = len(values) - 1 - np.argsort(values[::-1], kind="stable")[::-1]
+    else:
+        order = np.argsort(values, kind="stable")
+    return index[order]
+
+
+class ResultsTable(tk.Frame):
+    """
+    Virtualized table for the full ranked set. Only the rows in view exist as canvas
+    items (a fixed pool reused while scrolling), so 10,000 rows cost no more to show
+    than 20. Sorting (click a header) and filtering run on a worker thread; the result
+    is picked up by polling from the Tk thread.
+    """
+    ROW_HEIGHT = 26
+    HEADER_HEIGHT = 30
+    POLL_MS = 15
+
+    def __init__(self, master, columns, on_view_change=None, **kwargs):
+        super().__init__(master, bg=TABLE_BG, highlightthickness=0, **kwargs)
+        self.columns = columns
+        self.on_view_change = on_view_change
+        self.table = None
+        self.view = ()  # Row indices in display order
+        self.sort_key = columns[0][0]
+        self.descending = False
+        self.query = ""
+        self.offset = 0  # Scroll position in pixels
+        self._slots = []
+        self._column_x = []
+        self._redraw_pending = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="results-table")
+        self._pending_view = None
+        self.font = ("Segoe UI", 12)
+        self.header_font = ("Segoe UI", 13, "bold")
+
+        self.header = tk.Canvas(self, height=self.HEADER_HEIGHT, bg="#181d26", highlightthickness=0)
+        self.header.grid(row=0, column=0, sticky="ew")
+        self.canvas = tk.Canvas(self, bg=TABLE_BG, highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.header.bind("<Configure>", lambda e: self._layout())
+        self.header.bind("<Button-1>", self._on_header_click)
+        self.canvas.bind("<Configure>", lambda e: self._layout())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        self.bind("<Destroy>", lambda e: self._executor.shutdown(wait=False) if e.widget is self else None)
+
+    # --- Data ---
+    def set_data(self, table):
+        # A sort/filter still running belongs to the previous table
+        if self._pending_view is not None:
+            self._pending_view.cancel()
+            self._pending_view = None
+        self.table = table
+        self.view = range(table["size"]) if table else ()
+        self.sort_key = self.columns[0][0]
+        self.descending = False
+        self.offset = 0
+        self._draw_header()
+        self._view_changed()
+
+    def set_filter(self, query):
+        self.query = query.strip()
+        self._request_view()
+
+    def sort_by(self, key):
+        if key == self.sort_key:
+            self.descending = not self.descending
+        else:
+            self.sort_key, self.descending = key, False
+        self._draw_header()
+        self._request_view()
+
+    def _request_view(self):
+        if not self.table:
+            return
+        if self._pending_view is not None:
+            self._pending_view.cancel()
+        self._pending_view = self._executor.submit(compute_table_view, self.table, self.sort_key,
+                                                   self.descending, self.query)
+        self.after(self.POLL_MS, self._poll_view, self._pending_view)
+
+    def _poll_view(self, future):
+        if future is not self._pending_view or future.cancelled():
+            return  # Superseded by a newer sort/filter
+        if not future.done():
+            self.after(self.POLL_MS, self._poll_view, future)
+            return
+        self._pending_view = None
+        self.view = future.result()
+        self.offset = 0
+        self._view_changed()
+
+    def _view_changed(self):
+        self._schedule_redraw()
+        if self.on_view_change:
+            self.on_view_change(len(self.view), self.table["size"] if self.table else 0)
+
+    # --- Scrolling ---
+    def _max_offset(self):
+        return max(0, len(self.view) * self.ROW_HEIGHT - self.canvas.winfo_height())
+
+    def yview(self, *args):
+        if args and args[0] == "moveto":
+            self.offset = float(args[1]) * len(self.view) * self.ROW_HEIGHT
+        elif args and args[0] == "scroll":
+            step = self.canvas.winfo_height() if args[2] == "pages" else self.ROW_HEIGHT
+            self.offset += int(args[1]) * step
+        self.offset = int(min(max(self.offset, 0), self._max_offset()))
+        self._schedule_redraw()
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta / 120 if abs(event.delta) >= 120 else event.delta
+        self.offset -= int(notches * 3 * self.ROW_HEIGHT)
+        self.yview()
+
+    # --- Drawing ---
+    def _layout(self):
+        width = max(self.canvas.winfo_width(), 1)
+        total = sum(weight for _, _, weight in self.columns)
+        x, self._column_x = 0.0, []
+        for _, _, weight in self.columns:
+            self._column_x.append(x + 8)
+            x += width * weight / total
+        # One slot (stripe + a text item per column) per row that can be visible at once
+        needed = self.canvas.winfo_height() // self.ROW_HEIGHT + 2
+        while len(self._slots) < needed:
+            stripe = self.canvas.create_rectangle(0, 0, 0, 0, outline="", state="hidden")
+            cells = [self.canvas.create_text(0, 0, anchor="w", font=self.font, state="hidden",
+                                             fill=self._column_color(i)) for i in range(len(self.columns))]
+            self._slots.append((stripe, cells))
+        self._draw_header()
+        self.yview()
+
+    def _column_color(self, i):
+        return ACCENT_GREEN if i == 0 else ACCENT_BLUE if i == len(self.columns) - 1 else TEXT_WHITE
+
+    def _draw_header(self):
+        self.header.delete("all")
+        for i, (key, title, _) in enumerate(self.columns):
+            if key == self.sort_key:
+                title += " ▼" if self.descending else " ▲"
+            x = self._column_x[i] if i < len(self._column_x) else 0
+            self.header.create_text(x, self.HEADER_HEIGHT // 2, text=title, anchor="w", font=self.header_font,
+                                    fill=self._column_color(i))
+
+    def _on_header_click(self, event):
+        column = max((i for i, x in enumerate(self._column_x) if x - 8 <= event.x), default=0)
+        self.sort_by(self.columns[column][0])
+
+    def _schedule_redraw(self):
+        # Coalesce bursts of scroll events into one redraw per idle cycle
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        width = self.canvas.winfo_width()
+        first, shift = divmod(self.offset, self.ROW_HEIGHT)
+        text = self.table["text"] if self.table else {}
+        for slot, (stripe, cells) in enumerate(self._slots):
+            position = first + slot
+            if position >= len(self.view):
+                self.canvas.itemconfigure(stripe, state="hidden")
+                for item in cells:
+                    self.canvas.itemconfigure(item, state="hidden")
+                continue
+            row = self.view[position]
+            top = slot * self.ROW_HEIGHT - shift
+            self.canvas.coords(stripe, 0, top, width, top + self.ROW_HEIGHT)
+            self.canvas.itemconfigure(stripe, state="normal", fill=TABLE_STRIPE if position % 2 else TABLE_BG)
+            for (key, _, _), x, item in zip(self.columns, self._column_x, cells):
+                self.canvas.coords(item, x, top + self.ROW_HEIGHT // 2)
+                self.canvas.itemconfigure(item, state="normal", text=text[key][row])
+        total = len(self.view) * self.ROW_HEIGHT
+        if total <= self.canvas.winfo_height():
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.canvas.winfo_height()) / total)
+
+
 # --- Placeholder for your analysis_engine.py functions ---
 # In a real scenario, you would import them like:
 # from analysis_engine import analyze_bullish_risk_reversal, analyze_bearish_risk_reversal, format_text_report
 # For this skeleton, we'll use a dummy function.
 
-def dummy_analysis_engine_run(ticker, min_dte, max_dte, strategy_type):
+def dummy_analysis_engine_run(ticker, min_dte, max_dte, strategy_type, tracker=None):
     """
     A placeholder function to simulate your analysis_engine.
     In your actual app, this would call your real analysis functions.
@@ -195,8 +709,11 @@ Bid-Ask Spread: Call:$0.40, Put:$0.30, Total=$0.60
 # --- End of Placeholder ---
 
 class OptionAnalyzerApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, exit_after_startup=False):
+        startup_timeline.mark("imports")
         super().__init__()
+        startup_timeline.mark("root_window")
+        self.exit_after_startup = exit_after_startup
         self.title("VegaEdge - Option Strategy Analyzer")
         self.geometry("1400x900")  # Wider default window
         self.minsize(1200, 800)
@@ -209,18 +726,19 @@ class OptionAnalyzerApp(ctk.CTk):
         self.content.place(relx=0, rely=0, relwidth=1, relheight=1)
         self.create_widgets()
         self.setup_layout()
-        self.analysis_thread = None
+        self.jobs = AnalysisJobRunner(self, self._on_job_event)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        startup_timeline.mark("widgets")
+        self.bind("<Map>", self._on_first_map, add="+")
+        if exit_after_startup:
+            self.after(STARTUP_CHECK_TIMEOUT_MS, self._startup_timed_out)
 
     def create_widgets(self):
         # --- Ribbon/Header ---
         self.ribbon = ctk.CTkFrame(self.content, fg_color="#181d26", corner_radius=0, height=90)
         self.ribbon.pack_propagate(False)
         # Logo (smaller, left-aligned)
-        logo_path = resource_path("vegaedge_logo.png")
-        logo_img = Image.open(logo_path).convert("RGBA")
-        Resampling = getattr(Image, "Resampling", Image)
-        resample_filter = getattr(Resampling, "LANCZOS", getattr(Resampling, "BICUBIC"))
-        logo_img = logo_img.resize((60, 60), resample_filter)
+        logo_img = load_resized_image("vegaedge_logo.png", (60, 60))
         self.logo_ctk = ctk.CTkImage(light_image=logo_img, dark_image=logo_img, size=(60, 60))
         self.logo_label = ctk.CTkLabel(self.ribbon, image=self.logo_ctk, text="", bg_color="transparent")
         self.logo_label.pack(side="left", padx=(20, 10), pady=10)
@@ -255,6 +773,8 @@ class OptionAnalyzerApp(ctk.CTk):
         # Run Analysis button
         self.run_button = ctk.CTkButton(self.ribbon_inputs, text="Run Analysis", command=self.start_analysis, font=ctk.CTkFont(size=18, weight="bold"), height=40, width=140, fg_color=ACCENT_GREEN, hover_color=ACCENT_BLUE, text_color=TEXT_WHITE, corner_radius=12)
         self.run_button.pack(side="left", padx=(0, 0))
+        self.cancel_button = ctk.CTkButton(self.ribbon_inputs, text="Cancel", command=self.cancel_analysis, font=ctk.CTkFont(size=16, weight="bold"), height=40, width=90, fg_color="#232b3a", hover_color=ACCENT_BLUE, text_color=TEXT_WHITE, corner_radius=12, state="disabled")
+        self.cancel_button.pack(side="left", padx=(8, 0))
         # --- Error Message (below ribbon) ---
         self.error_var = ctk.StringVar(value="")
         self.error_label = ctk.CTkLabel(self.content, textvariable=self.error_var, text_color=ACCENT_GREEN, font=ctk.CTkFont(size=15, weight="bold"), bg_color="transparent")
@@ -272,27 +792,57 @@ class OptionAnalyzerApp(ctk.CTk):
         self.pricing_tab = self.tabview.add("Pricing Comparison")
         self.pricing_comparison_text = ctk.CTkTextbox(self.pricing_tab, height=200, fg_color="#232b3a", text_color=TEXT_WHITE, font=entry_font2)
         self.pricing_comparison_text.pack(fill="both", expand=True, padx=10, pady=10)
-        self.results_tab = self.tabview.add("Top 5 Results")
-        table_frame = ctk.CTkFrame(self.results_tab, fg_color="transparent")
-        table_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        headers = ["Rank", "Expiration", "Strikes", "Net Cost", "Net Vega", "Efficiency", "Score"]
-        header_frame = ctk.CTkFrame(table_frame, fg_color="transparent")
-        header_frame.pack(fill="x", padx=5, pady=5)
-        for i, header in enumerate(headers):
-            label = ctk.CTkLabel(header_frame, text=header, font=ctk.CTkFont(size=15, weight="bold"), text_color=ACCENT_GREEN if i==0 else ACCENT_BLUE if i==6 else TEXT_WHITE, width=120 if i < len(headers) - 1 else 80, bg_color="transparent")
-            label.grid(row=0, column=i, padx=2, pady=5, sticky="ew")
-            header_frame.grid_columnconfigure(i, weight=1)
-        self.results_scrollable_frame = ctk.CTkScrollableFrame(table_frame, height=300, fg_color="#232b3a")
-        self.results_scrollable_frame.pack(fill="both", expand=True, padx=5, pady=5)
-        self.result_labels = []
+        self.results_tab = self.tabview.add("Ranked Results")
+        table_toolbar = ctk.CTkFrame(self.results_tab, fg_color="transparent")
+        table_toolbar.pack(fill="x", padx=10, pady=(10, 0))
+        self.margin_label = ctk.CTkLabel(table_toolbar, text="", font=ctk.CTkFont(size=15, weight="bold"), text_color=ACCENT_BLUE, bg_color="transparent")
+        self.margin_label.pack(side="left", padx=5)
+        self.filter_entry = ctk.CTkEntry(table_toolbar, width=260, placeholder_text="Filter: expiration, strike, CR/DB", font=ctk.CTkFont(size=14), fg_color="#232b3a", text_color=TEXT_WHITE)
+        self.filter_entry.pack(side="right", padx=5)
+        self.filter_entry.bind("<KeyRelease>", self._on_filter_changed)
+        self.row_count_label = ctk.CTkLabel(table_toolbar, text="", font=ctk.CTkFont(size=14), text_color=TEXT_GRAY, bg_color="transparent")
+        self.row_count_label.pack(side="right", padx=10)
+        self.results_table = ResultsTable(self.results_tab, RESULT_COLUMNS, on_view_change=self._update_row_count)
+        self.results_table.pack(fill="both", expand=True, padx=10, pady=10)
+        self._filter_job = None
         # --- Status Bar ---
-        self.status_bar = ctk.CTkLabel(self.content, text="Ready", font=ctk.CTkFont(size=15), text_color=TEXT_GRAY, bg_color="transparent")
+        self.status_frame = ctk.CTkFrame(self.content, fg_color="transparent")
+        self.status_bar = ctk.CTkLabel(self.status_frame, text="Loading analysis engine...", font=ctk.CTkFont(size=15), text_color=TEXT_GRAY, bg_color="transparent")
+        self.status_bar.pack(side="left", fill="x", expand=True)
+        self.progress_bar = ctk.CTkProgressBar(self.status_frame, width=240, progress_color=ACCENT_GREEN)
+        self.progress_bar.set(0)
 
     def setup_layout(self):
         self.ribbon.pack(fill="x", pady=(0, 0))
         self.error_label.pack(pady=(0, 5))
         self.results_card.pack(fill="both", expand=True, padx=80, pady=(10, 20))
-        self.status_bar.pack(side="bottom", fill="x", padx=20, pady=8)
+        self.status_frame.pack(side="bottom", fill="x", padx=20, pady=8)
+
+    def _on_first_map(self, event):
+        if event.widget is not self or "first_window" in startup_timeline.marks:
+            return
+        startup_timeline.mark("first_window")
+        # Let the first frame paint before the heavy imports start competing for the GIL
+        self.after_idle(start_engine_import)
+        self.after(100, self._poll_engine)
+
+    def _poll_engine(self):
+        if not engine_ready():
+            self.after(100, self._poll_engine)
+            return
+        print(startup_timeline.summary())
+        if not self.jobs.running:
+            if _engine is None:
+                self.update_status(f"Analysis engine failed to load: {_engine_error}", True)
+            else:
+                self.update_status("Ready")
+        if self.exit_after_startup:
+            self._on_close()
+
+    def _startup_timed_out(self):
+        print(f"Startup check timed out after {STARTUP_CHECK_TIMEOUT_MS / 1000:.0f}s")
+        print(startup_timeline.summary())
+        self._on_close()
 
     def update_status(self, message, is_error=False):
         if is_error:
@@ -317,54 +867,72 @@ class OptionAnalyzerApp(ctk.CTk):
         except ValueError as e:
             self.update_status(f"Error: Invalid DTEs. {e}", is_error=True)
             return
-        self.update_status("Analysis Running... Please wait.")
-        self.run_button.configure(state="disabled")
         self.clear_results()
-        self.analysis_thread = threading.Thread(target=self._run_analysis_thread, args=(ticker, min_dte, max_dte, strategy_type))
-        self.analysis_thread.start()
+        # A new request supersedes the running one
+        self.jobs.submit(ticker, min_dte, max_dte, strategy_type)
+        self.update_status(f"Analyzing {ticker}...")
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="right", padx=(10, 0))
+        self.cancel_button.configure(state="normal")
 
-    def _run_analysis_thread(self, ticker, min_dte, max_dte, strategy_type):
-        try:
-            # For debugging, you can swap the next line:
-            # result_data = live_analysis_engine_run(ticker, min_dte, max_dte, strategy_type)
-            # with this line to use the dummy engine:
-            # result_data = dummy_analysis_engine_run(ticker, min_dte, max_dte, strategy_type)
-            result_data = live_analysis_engine_run(ticker, min_dte, max_dte, strategy_type)
-            self.after(0, self.display_results, result_data)
-            self.after(0, self.update_status, "Analysis completed.")
-        except Exception as e:
-            self.after(0, lambda: self.update_status(f"Analysis Error: {e}", True))
-        finally:
-            self.after(0, lambda: self.run_button.configure(state="normal"))
+    def cancel_analysis(self):
+        if self.jobs.running:
+            self.jobs.cancel()
+            self.update_status("Cancelling...")
+
+    def _on_job_event(self, kind, payload):
+        if kind == "progress":
+            stage, message, fraction = payload
+            self.update_status(message)
+            self.progress_bar.set(fraction)
+            return
+        self.progress_bar.pack_forget()
+        self.cancel_button.configure(state="disabled")
+        if kind == "done":
+            self.display_results(payload)
+            self.update_status("Analysis completed.")
+        elif kind == "cancelled":
+            self.update_status("Analysis cancelled.")
+        else:
+            self.update_status(f"Analysis Error: {payload}", True)
+
+    def _on_close(self):
+        self.jobs.cancel()
+        self.destroy()
 
     def clear_results(self):
         self.top_trade_summary_text.delete("0.0", "end")
         self.risk_overview_text.delete("0.0", "end")
         self.pricing_comparison_text.delete("0.0", "end")
-        for label in self.result_labels:
-            label.destroy()
-        self.result_labels.clear()
+        self.margin_label.configure(text="")
+        self.results_table.set_data(None)
+
+    def _on_filter_changed(self, event=None):
+        # Filter once typing pauses rather than on every key
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.results_table.set_filter(self.filter_entry.get())
+
+    def _update_row_count(self, shown, total):
+        if not total:
+            self.row_count_label.configure(text="")
+        elif shown == total:
+            self.row_count_label.configure(text=f"{total:,} combinations")
+        else:
+            self.row_count_label.configure(text=f"{shown:,} of {total:,} combinations")
 
     def display_results(self, result_data):
-        self.top_trade_summary_text.delete("0.0", "end")
-        self.risk_overview_text.delete("0.0", "end")
-        self.pricing_comparison_text.delete("0.0", "end")
-        for label in self.result_labels:
-            label.destroy()
-        self.result_labels.clear()
+        self.clear_results()
 
         self.top_trade_summary_text.insert("0.0", result_data.get("summary", ""))
         self.risk_overview_text.insert("0.0", result_data.get("risk", ""))
         self.pricing_comparison_text.insert("0.0", result_data.get("pricing_comparison", ""))
 
-        # --- Top 15 Table ---
-        all_results = result_data.get("top_5", [])[:15]
-        top_5 = all_results[:5]
-        next_10 = all_results[5:15]
-
-        # Remove all widgets from the scrollable frame
-        for widget in self.results_scrollable_frame.winfo_children():
-            widget.destroy()
+        top_5 = result_data.get("top_5", [])[:5]
 
         # --- Margin Impact Row (IBKR RegT for Risk Reversal) ---
         margin_impact_text = "Margin Impact: N/A"
@@ -408,45 +976,19 @@ class OptionAnalyzerApp(ctk.CTk):
                 margin_impact_text = f"Margin Impact: ${margin_short_call:,.2f} {margin_note}"
             except Exception:
                 pass  # Leave as N/A if parsing fails
-        margin_label = ctk.CTkLabel(self.results_scrollable_frame, text=margin_impact_text, font=ctk.CTkFont(size=15, weight="bold"), text_color=ACCENT_BLUE, bg_color="transparent")
-        margin_label.pack(pady=(0, 8))
-        self.result_labels.append(margin_label)
-
-        # Top 5
-        for rank, exp, strikes, cost, vega, eff, score in top_5:
-            row_frame = ctk.CTkFrame(self.results_scrollable_frame, fg_color="#232b3a")
-            row_frame.pack(fill="x", padx=5, pady=2)
-            columns = [rank, exp, strikes, cost, vega, eff, score]
-            for i, value in enumerate(columns):
-                label = ctk.CTkLabel(row_frame, text=value, font=ctk.CTkFont(size=14), text_color=ACCENT_GREEN if i==0 else ACCENT_BLUE if i==6 else TEXT_WHITE, width=120 if i < len(columns) - 1 else 80, bg_color="transparent")
-                label.grid(row=0, column=i, padx=2, pady=2, sticky="ew")
-                row_frame.grid_columnconfigure(i, weight=1)
-                self.result_labels.append(label)
-
-        # Spacer between tables if there are more than 5
-        if next_10:
-            spacer = ctk.CTkLabel(self.results_scrollable_frame, text="\nNext Best Results:", font=ctk.CTkFont(size=15, weight="bold"), text_color=ACCENT_BLUE, bg_color="transparent")
-            spacer.pack(pady=(10, 2))
-            # Table headers for next 10
-            header_frame = ctk.CTkFrame(self.results_scrollable_frame, fg_color="transparent")
-            header_frame.pack(fill="x", padx=5, pady=2)
-            headers = ["Rank", "Expiration", "Strikes", "Net Cost", "Net Vega", "Efficiency", "Score"]
-            for i, header in enumerate(headers):
-                label = ctk.CTkLabel(header_frame, text=header, font=ctk.CTkFont(size=13, weight="bold"), text_color=ACCENT_GREEN if i==0 else ACCENT_BLUE if i==6 else TEXT_WHITE, width=120 if i < len(headers) - 1 else 80, bg_color="transparent")
-                label.grid(row=0, column=i, padx=2, pady=2, sticky="ew")
-                header_frame.grid_columnconfigure(i, weight=1)
-                self.result_labels.append(label)
-            # Next 10 (or up to 15 total)
-            for rank, exp, strikes, cost, vega, eff, score in next_10:
-                row_frame = ctk.CTkFrame(self.results_scrollable_frame, fg_color="#232b3a")
-                row_frame.pack(fill="x", padx=5, pady=2)
-                columns = [rank, exp, strikes, cost, vega, eff, score]
-                for i, value in enumerate(columns):
-                    label = ctk.CTkLabel(row_frame, text=value, font=ctk.CTkFont(size=13), text_color=ACCENT_GREEN if i==0 else ACCENT_BLUE if i==6 else TEXT_WHITE, width=120 if i < len(columns) - 1 else 80, bg_color="transparent")
-                    label.grid(row=0, column=i, padx=2, pady=2, sticky="ew")
-                    row_frame.grid_columnconfigure(i, weight=1)
-                    self.result_labels.append(label)
+        self.margin_label.configure(text=margin_impact_text)
+
+        # --- Every ranked combination, sortable and filterable ---
+        self.results_table.set_data(result_data.get("table"))
+        if self.filter_entry.get().strip():
+            self._apply_filter()
 
 if __name__ == "__main__":
-    app = OptionAnalyzerApp()
-    app.mainloop()
\ No newline at end of file
+    # --startup-timeline: open the window, wait for the engine, print the timeline and
+    # exit. Status 1 when the first window took longer than FIRST_WINDOW_TARGET_MS or never
+    # opened, or the engine failed to load (or neither happened within STARTUP_CHECK_TIMEOUT_MS)
+    check_startup = "--startup-timeline" in sys.argv
+    app = OptionAnalyzerApp(exit_after_startup=check_startup)
+    app.mainloop()
+    if check_startup and (startup_timeline.over_target() or _engine is None):
+        sys.exit(1)
\ No newline at end of file
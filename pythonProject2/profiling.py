@@ -0,0 +1,63 @@
+"""
+Sampling profiler for single requests.
+
+A background thread snapshots the stack of one thread at a fixed interval and counts
+identical stacks. The result is in the collapsed format read by flamegraph.pl,
+speedscope and similar tools: one line per unique stack, frames root first and
+separated by ';', followed by the sample count.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Profiles the thread that enters the `with` block:
+
+        with SamplingProfiler() as profiler:
+            run_ranked_analysis(...)
+        print(profiler.collapsed())
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """The collapsed stacks, hottest first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
@@ -0,0 +1,631 @@
+"""
+Strategy definitions and the shared enumeration and ranking core.
+
+A strategy is a plain dict describing its legs, strike ordering, validity rules and
+score weights. Every strategy runs through the same vectorized core: leg candidates
+are combined one leg at a time with numpy broadcasting, partial combinations that can
+no longer meet the cost/delta/vega bounds are dropped before the next leg is added,
+and the survivors are ranked with the same min-max scoring. Pair order and arithmetic
+match the original risk reversal loops, so their results are reproduced exactly.
+
+Strategy dict keys:
+    name           display name, stored in the 'strategy_type' column
+    legs           list of {'name', 'type': 'call'|'put', 'side': 1 (long)|-1 (short),
+                   'moneyness': 'otm'|'any', 'quantity' (default 1)}
+    strike_order   list of (higher_leg, lower_leg) names whose strikes must be strictly ordered
+    cross_expiration  legs may come from different expirations (diagonals); the chains passed
+                   in then span several expirations and carry a 'days_to_exp' column
+    expiry_order   list of (later_leg, earlier_leg) names whose expirations must be strictly ordered
+    direction      1 bullish (net delta above min_abs_net_delta), -1 bearish (below its negative),
+                   0 neutral (abs(net delta) at most max_abs_net_delta)
+    criteria       strategy specific defaults layered over analysis_engine.DEFAULT_CRITERIA
+    scores         (score_name, metric, use_abs, reverse) tuples, normalized in this order
+    weights        score_name -> weight for total_score
+    stock_delta    delta of a stock position held alongside the options (optional)
+    describe       function(legs, totals) -> ordered dict of output columns (optional)
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_SCORE_WEIGHTS = {'delta': 0.40, 'efficiency': 0.40, 'vega': 0.20}
+
+# Upper bound on the number of cells in one broadcast block (partial combinations x leg candidates)
+ENUMERATION_BLOCK_SIZE = 1 << 20
+
+# Slack used when pruning partial combinations, so rounding never drops a valid one
+PRUNE_TOLERANCE = 1e-9
+
+LEG_COLUMNS = ('strike', 'bid', 'ask', 'impliedVolatility', 'delta', 'vega')
+
+
+# -------------------------------
+# Output Columns
+# -------------------------------
+def _efficiency(net_cost, strike_width):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(strike_width > 0, -net_cost / strike_width, 0.0)
+
+
+def _pricing_comparison(call, put, strategy_type):
+    """Vectorized calculate_alternative_pricing, one dict per combination."""
+    call_mid = (call['bid'] + call['ask']) / 2
+    put_mid = (put['bid'] + put['ask']) / 2
+    if strategy_type == 'bullish':
+        current, mid, optimistic = call['ask'] - put['bid'], call_mid - put_mid, call['bid'] - put['ask']
+    else:
+        current, mid, optimistic = put['ask'] - call['bid'], put_mid - call_mid, put['bid'] - call['ask']
+    call_spread = call['ask'] - call['bid']
+    put_spread = put['ask'] - put['bid']
+    columns = {
+        'current_method': current, 'mid_price_method': mid, 'optimistic_method': optimistic,
+        'call_spread': call_spread, 'put_spread': put_spread, 'total_spread': call_spread + put_spread,
+        'call_mid': call_mid, 'put_mid': put_mid,
+    }
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*(columns[key].tolist() for key in keys))]
+
+
+def _describe_bullish_risk_reversal(legs, totals):
+    call, put = legs['long_call'], legs['short_put']
+    net_cost = totals['net_cost']
+    return {
+        'long_call_strike': call['strike'], 'short_put_strike': put['strike'],
+        'net_cost': net_cost, 'iv_advantage': put['impliedVolatility'] - call['impliedVolatility'],
+        'net_delta': totals['net_delta'], 'net_vega': totals['net_vega'],
+        'max_loss_down': put['strike'] - (put['bid'] - call['ask']),
+        'breakeven': call['strike'] + net_cost,
+        'efficiency': _efficiency(net_cost, call['strike'] - put['strike']),
+        'pricing_comparison': _pricing_comparison(call, put, 'bullish'),
+    }
+
+
+def _describe_bearish_risk_reversal(legs, totals):
+    put, call = legs['long_put'], legs['short_call']
+    net_cost = totals['net_cost']
+    return {
+        'long_put_strike': put['strike'], 'short_call_strike': call['strike'],
+        'net_cost': net_cost, 'iv_advantage': call['impliedVolatility'] - put['impliedVolatility'],
+        'net_delta': totals['net_delta'], 'net_vega': totals['net_vega'],
+        'max_loss_up': call['strike'] + (call['bid'] - put['ask']),
+        'breakeven': put['strike'] - net_cost,
+        'efficiency': _efficiency(net_cost, call['strike'] - put['strike']),
+        'pricing_comparison': _pricing_comparison(call, put, 'bearish'),
+    }
+
+
+def describe_generic(strategy, legs, totals):
+    """Default output columns: one strike per leg plus net Greeks, IV edge and cost efficiency."""
+    columns = {f"{leg['name']}_strike": legs[leg['name']]['strike'] for leg in strategy['legs']}
+    strikes = np.column_stack([legs[leg['name']]['strike'] for leg in strategy['legs']])
+    iv_advantage = sum(-leg['side'] * leg.get('quantity', 1) * legs[leg['name']]['impliedVolatility']
+                       for leg in strategy['legs'])
+    columns.update({
+        'net_cost': totals['net_cost'], 'iv_advantage': iv_advantage,
+        'net_delta': totals['net_delta'], 'net_vega': totals['net_vega'],
+        'strike_width': strikes.max(axis=1) - strikes.min(axis=1),
+    })
+    columns['efficiency'] = _efficiency(totals['net_cost'], columns['strike_width'])
+    return columns
+
+
+# -------------------------------
+# Strategy Registry
+# -------------------------------
+BULLISH_SCORES = [('delta', 'net_delta', False, False), ('vega', 'net_vega', False, False),
+                  ('efficiency', 'efficiency', False, False)]
+# For bearish trades a more negative delta and a smaller absolute vega score higher
+BEARISH_SCORES = [('delta', 'net_delta', False, True), ('vega', 'net_vega', True, True),
+                  ('efficiency', 'efficiency', False, False)]
+NEUTRAL_SCORES = [('delta', 'net_delta', True, True), ('vega', 'net_vega', True, True),
+                  ('efficiency', 'efficiency', False, False)]
+
+STRATEGIES = {
+    'Bullish': {
+        'name': 'Bullish Risk Reversal',
+        'legs': [{'name': 'long_call', 'type': 'call', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('long_call', 'short_put')],
+        'direction': 1,
+        'criteria': {'min_net_vega': 0.0},
+        'scores': BULLISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+        'describe': _describe_bullish_risk_reversal,
+    },
+    'Bearish': {
+        'name': 'Bearish Risk Reversal',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('short_call', 'long_put')],
+        'direction': -1,
+        'criteria': {'max_net_vega': 0.01},
+        'scores': BEARISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+        'describe': _describe_bearish_risk_reversal,
+    },
+    'Bull Call Spread': {
+        'name': 'Bull Call Spread',
+        'legs': [{'name': 'long_call', 'type': 'call', 'side': 1, 'moneyness': 'any'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('short_call', 'long_call')],
+        'direction': 1,
+        'criteria': {},
+        'scores': BULLISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+    'Bear Put Spread': {
+        'name': 'Bear Put Spread',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'any'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('long_put', 'short_put')],
+        'direction': -1,
+        'criteria': {},
+        'scores': BEARISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+    'Collar': {
+        # Protective put financed by a covered call on 100 shares held
+        'name': 'Collar',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('short_call', 'long_put')],
+        'direction': 1,
+        'stock_delta': 1.0,
+        'criteria': {},
+        'scores': [('delta', 'net_delta', False, True), ('vega', 'net_vega', True, True),
+                   ('efficiency', 'efficiency', False, False)],
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+    'Bullish Seagull': {
+        'name': 'Bullish Seagull',
+        'legs': [{'name': 'long_call', 'type': 'call', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('short_call', 'long_call'), ('long_call', 'short_put')],
+        'direction': 1,
+        'criteria': {},
+        'scores': BULLISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+    'Bearish Seagull': {
+        'name': 'Bearish Seagull',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('long_put', 'short_put'), ('short_call', 'long_put')],
+        'direction': -1,
+        'criteria': {},
+        'scores': BEARISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+    # Diagonal risk reversals: the long leg in a later expiration than the short one
+    'Bullish Diagonal': {
+        'name': 'Bullish Diagonal Risk Reversal',
+        'legs': [{'name': 'long_call', 'type': 'call', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('long_call', 'short_put')],
+        'cross_expiration': True,
+        'expiry_order': [('long_call', 'short_put')],
+        'direction': 1,
+        'criteria': {'min_net_vega': 0.0},
+        'scores': BULLISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+        'describe': _describe_bullish_risk_reversal,
+    },
+    'Bearish Diagonal': {
+        'name': 'Bearish Diagonal Risk Reversal',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'}],
+        'strike_order': [('short_call', 'long_put')],
+        'cross_expiration': True,
+        'expiry_order': [('long_put', 'short_call')],
+        'direction': -1,
+        'criteria': {'max_net_vega': 0.01},
+        'scores': BEARISH_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+        'describe': _describe_bearish_risk_reversal,
+    },
+    'Iron Condor': {
+        'name': 'Iron Condor',
+        'legs': [{'name': 'long_put', 'type': 'put', 'side': 1, 'moneyness': 'otm'},
+                 {'name': 'short_put', 'type': 'put', 'side': -1, 'moneyness': 'otm'},
+                 {'name': 'short_call', 'type': 'call', 'side': -1, 'moneyness': 'otm'},
+                 {'name': 'long_call', 'type': 'call', 'side': 1, 'moneyness': 'otm'}],
+        'strike_order': [('short_put', 'long_put'), ('short_call', 'short_put'), ('long_call', 'short_call')],
+        'direction': 0,
+        'criteria': {'max_abs_net_delta': 0.1},
+        'scores': NEUTRAL_SCORES,
+        'weights': DEFAULT_SCORE_WEIGHTS,
+    },
+}
+
+
+def get_strategy(strategy_type):
+    try:
+        return STRATEGIES[strategy_type]
+    except KeyError:
+        raise ValueError(f"Unknown strategy '{strategy_type}'. Available: {', '.join(STRATEGIES)}")
+
+
+def strategy_slug(strategy_type):
+    return strategy_type.lower().replace(' ', '-')
+
+
+def find_strategy_type(slug):
+    """Registry key for a URL/CLI slug such as 'bull-call-spread', or None."""
+    for strategy_type in STRATEGIES:
+        if strategy_slug(strategy_type) == slug.lower():
+            return strategy_type
+    return None
+
+
+# -------------------------------
+# Vectorized Enumeration Core
+# -------------------------------
+def _moneyness_mask(leg, strikes, underlying_price):
+    if leg.get('moneyness', 'otm') == 'any':
+        return np.ones(len(strikes), dtype=bool)
+    return strikes > underlying_price if leg['type'] == 'call' else strikes < underlying_price
+
+
+def prefilter_chain(strategy, calls, puts, underlying_price):
+    """Keep only the contracts some leg can use, so Greeks are not computed for the rest."""
+    filtered = []
+    for df, option_type in [(calls, 'call'), (puts, 'put')]:
+        if df.empty:
+            filtered.append(df)
+            continue
+        keep = np.zeros(len(df), dtype=bool)
+        for leg in strategy['legs']:
+            if leg['type'] == option_type:
+                keep |= _moneyness_mask(leg, df['strike'].to_numpy(), underlying_price)
+        filtered.append(df[keep].copy())
+    return filtered[0], filtered[1]
+
+
+def _expiry_mask(strategy, leg, chains):
+    """Drop expirations a leg can never use: a 'later' leg needs some earlier expiry to pair with, and vice versa."""
+    days = chains[leg['type']]['days_to_exp'].to_numpy()
+    mask = np.ones(len(days), dtype=bool)
+    legs = {other['name']: other for other in strategy['legs']}
+    for later, earlier in strategy.get('expiry_order', []):
+        if leg['name'] == later:
+            other_days = chains[legs[earlier]['type']]['days_to_exp']
+            mask &= days > other_days.min() if len(other_days) else False
+        elif leg['name'] == earlier:
+            other_days = chains[legs[later]['type']]['days_to_exp']
+            mask &= days < other_days.max() if len(other_days) else False
+    return mask
+
+
+def build_leg_pools(strategy, calls, puts, underlying_price):
+    """Per-leg dicts of candidate arrays, in chain order. Calls/puts need 'delta' and 'vega' columns."""
+    chains = {'call': calls, 'put': puts}
+    pools = []
+    for leg in strategy['legs']:
+        df = chains[leg['type']]
+        mask = _moneyness_mask(leg, df['strike'].to_numpy(), underlying_price)
+        columns = LEG_COLUMNS
+        if strategy.get('cross_expiration'):
+            mask &= _expiry_mask(strategy, leg, chains)
+            columns = LEG_COLUMNS + ('days_to_exp',)
+        pool = {col: df[col].to_numpy(dtype=float)[mask] for col in columns}
+        if strategy.get('cross_expiration'):
+            pool['expiration'] = df['expiration'].to_numpy()[mask]
+        pools.append(pool)
+    return pools
+
+
+def _bounds_mask(net_cost, net_delta, net_vega, direction, criteria):
+    """Final validity rules shared by every strategy."""
+    mask = np.abs(net_cost) <= criteria['max_net_cost']
+    if direction:
+        mask &= direction * net_delta > criteria['min_abs_net_delta']
+    else:
+        mask &= np.abs(net_delta) <= criteria['max_abs_net_delta']
+    if criteria.get('min_net_vega') is not None:
+        mask &= net_vega > criteria['min_net_vega']
+    if criteria.get('max_net_vega') is not None:
+        mask &= net_vega <= criteria['max_net_vega']
+    return mask
+
+
+def _feasible_mask(partial, remaining, direction, criteria):
+    """Partial combinations whose bounds can still be met by some choice of the remaining legs."""
+    tol = PRUNE_TOLERANCE
+    cost_lo, cost_hi = partial['cost'] + remaining['cost'][0], partial['cost'] + remaining['cost'][1]
+    mask = (cost_hi >= -criteria['max_net_cost'] - tol) & (cost_lo <= criteria['max_net_cost'] + tol)
+
+    delta_lo, delta_hi = partial['delta'] + remaining['delta'][0], partial['delta'] + remaining['delta'][1]
+    if direction > 0:
+        mask &= delta_hi > criteria['min_abs_net_delta'] - tol
+    elif direction < 0:
+        mask &= -delta_lo > criteria['min_abs_net_delta'] - tol
+    else:
+        mask &= (delta_hi >= -criteria['max_abs_net_delta'] - tol) & (delta_lo <= criteria['max_abs_net_delta'] + tol)
+
+    if criteria.get('min_net_vega') is not None:
+        mask &= partial['vega'] + remaining['vega'][1] > criteria['min_net_vega'] - tol
+    if criteria.get('max_net_vega') is not None:
+        mask &= partial['vega'] + remaining['vega'][0] <= criteria['max_net_vega'] + tol
+    return mask
+
+
+def enumerate_combinations(strategy, pools, criteria):
+    """
+    Enumerate every valid leg combination of `strategy`.
+    Returns (indices, totals): an (n, legs) array of row indices into each leg's pool, in
+    leg-major order (first leg outermost), and the net cost/delta/vega of each combination.
+    """
+    legs = strategy['legs']
+    direction = strategy['direction']
+    names = [leg['name'] for leg in legs]
+    empty = (np.empty((0, len(legs)), dtype=int), {key: np.empty(0) for key in ('net_cost', 'net_delta', 'net_vega')})
+    if any(len(pool['strike']) == 0 for pool in pools):
+        return empty
+
+    # Per-leg contributions: longs pay the ask, shorts receive the bid
+    contrib = []
+    for leg, pool in zip(legs, pools):
+        sign = leg['side'] * leg.get('quantity', 1)
+        price = pool['ask'] if leg['side'] > 0 else pool['bid']
+        contrib.append({'cost': sign * price, 'delta': sign * pool['delta'], 'vega': sign * pool['vega']})
+
+    # Reachable [min, max] of each metric summed over legs m..end
+    remaining = [None] * (len(legs) + 1)
+    remaining[len(legs)] = {key: (0.0, 0.0) for key in ('cost', 'delta', 'vega')}
+    for m in range(len(legs) - 1, -1, -1):
+        remaining[m] = {key: (remaining[m + 1][key][0] + contrib[m][key].min(),
+                              remaining[m + 1][key][1] + contrib[m][key].max()) for key in contrib[m]}
+
+    # Strike (and for diagonals expiry) ordering constraints, checked when their later leg is added
+    order_checks = [[] for _ in legs]
+    for column, constraints in (('strike', strategy.get('strike_order', [])),
+                                ('days_to_exp', strategy.get('expiry_order', []))):
+        for higher, lower in constraints:
+            h, l = names.index(higher), names.index(lower)
+            order_checks[max(h, l)].append((min(h, l), max(h, l) == h, column))
+
+    indices = np.arange(len(pools[0]['strike']))[:, None]
+    partial = {key: contrib[0][key].copy() for key in contrib[0]}
+    if strategy.get('stock_delta'):
+        partial['delta'] = partial['delta'] + strategy['stock_delta']
+    if len(legs) > 1:
+        keep = _feasible_mask(partial, remaining[1], direction, criteria)
+        indices, partial = indices[keep], {key: values[keep] for key, values in partial.items()}
+        if len(indices) == 0:
+            return empty
+    else:
+        keep = _bounds_mask(partial['cost'], partial['delta'], partial['vega'], direction, criteria)
+        return indices[keep], {f'net_{key}': values[keep] for key, values in partial.items()}
+
+    for m in range(1, len(legs)):
+        last = m == len(legs) - 1
+        block_rows = max(1, ENUMERATION_BLOCK_SIZE // len(pools[m]['strike']))
+        new_indices, new_partial = [], {key: [] for key in partial}
+        for start in range(0, len(indices), block_rows):
+            rows = slice(start, start + block_rows)
+            block = {key: partial[key][rows, None] + contrib[m][key][None, :] for key in partial}
+            if last:
+                mask = _bounds_mask(block['cost'], block['delta'], block['vega'], direction, criteria)
+            else:
+                mask = _feasible_mask(block, remaining[m + 1], direction, criteria)
+            for other, leg_is_higher, column in order_checks[m]:
+                leg_values = pools[m][column][None, :]
+                other_values = pools[other][column][indices[rows, other]][:, None]
+                mask &= (leg_values > other_values) if leg_is_higher else (leg_values < other_values)
+            r, c = np.nonzero(mask)
+            new_indices.append(np.column_stack([indices[rows][r], c]))
+            for key in partial:
+                new_partial[key].append(block[key][r, c])
+        indices = np.concatenate(new_indices)
+        partial = {key: np.concatenate(values) for key, values in new_partial.items()}
+        if len(indices) == 0:
+            return empty
+
+    return indices, {f'net_{key}': values for key, values in partial.items()}
+
+
+def describe_combinations(strategy, pools, indices, totals):
+    """Output columns for enumerated combinations, via the strategy's describe hook."""
+    legs = {leg['name']: {col: values[indices[:, i]] for col, values in pool.items()}
+            for i, (leg, pool) in enumerate(zip(strategy['legs'], pools))}
+    columns = strategy['describe'](legs, totals) if 'describe' in strategy else describe_generic(strategy, legs, totals)
+    if strategy.get('cross_expiration'):
+        for leg in strategy['legs']:
+            columns[f"{leg['name']}_expiration"] = legs[leg['name']]['expiration']
+            columns[f"{leg['name']}_days_to_exp"] = legs[leg['name']]['days_to_exp'].astype(int)
+    return columns
+
+
+# -------------------------------
+# Incremental Enumeration
+# -------------------------------
+def match_pool_rows(old_pool, new_pool):
+    """
+    For each row of `new_pool`, the row of `old_pool` with the same strike and identical leg
+    values, or -1 when the contract is new or its quote, IV or Greeks changed.
+    Strikes must be unique within each pool (one contract per strike and expiration).
+    """
+    old_strikes, new_strikes = old_pool['strike'], new_pool['strike']
+    matched = np.full(len(new_strikes), -1)
+    if len(old_strikes) == 0 or len(new_strikes) == 0:
+        return matched
+    order = np.argsort(old_strikes, kind='stable')
+    candidate = order[np.minimum(np.searchsorted(old_strikes[order], new_strikes), len(order) - 1)]
+    same = np.ones(len(new_strikes), dtype=bool)
+    for col in LEG_COLUMNS:
+        same &= old_pool[col][candidate] == new_pool[col]
+    matched[same] = candidate[same]
+    return matched
+
+
+def update_combinations(strategy, old_pools, old_indices, new_pools, criteria):
+    """
+    enumerate_combinations(new_pools), reusing the result for `old_pools` where legs did not change.
+
+    A combination whose legs are all unchanged is valid now exactly when it was before, so only
+    combinations with at least one changed row are enumerated: one search per leg m, over the
+    unchanged rows of the legs before m, the changed rows of leg m and all rows after it. The
+    searches are disjoint and their sums are added up leg by leg as in a full enumeration, so
+    net values come out bit for bit the same.
+
+    Returns (kept, kept_indices, new_indices, new_totals), or None when the pools cannot be
+    diffed (repeated strikes): `kept` selects the still valid rows of `old_indices` and
+    `kept_indices` holds them as rows of `new_pools`; `new_indices` and `new_totals` are the
+    valid combinations using a changed row. Put together in leg-major order (see
+    merge_combination_order) they are exactly what a full enumeration returns.
+    """
+    if strategy.get('cross_expiration'):
+        return None
+    n_legs = len(strategy['legs'])
+    unchanged, new_row_of_old = [], []
+    for old_pool, new_pool in zip(old_pools, new_pools):
+        if any(len(np.unique(pool['strike'])) != len(pool['strike']) for pool in (old_pool, new_pool)):
+            return None
+        matched = match_pool_rows(old_pool, new_pool)
+        mapping = np.full(len(old_pool['strike']), -1)
+        mapping[matched[matched >= 0]] = np.nonzero(matched >= 0)[0]
+        unchanged.append(matched >= 0)
+        new_row_of_old.append(mapping)
+
+    if len(old_indices):
+        mapped = np.column_stack([new_row_of_old[m][old_indices[:, m]] for m in range(n_legs)])
+    else:
+        mapped = np.empty((0, n_legs), dtype=int)
+    kept = (mapped >= 0).all(axis=1)
+
+    found, found_totals = [], []
+    for m in range(n_legs):
+        rows = [np.nonzero(unchanged[l])[0] if l < m else
+                np.nonzero(~unchanged[l])[0] if l == m else
+                np.arange(len(new_pools[l]['strike'])) for l in range(n_legs)]
+        if any(len(leg_rows) == 0 for leg_rows in rows):
+            continue
+        sub_pools = [{col: values[leg_rows] for col, values in pool.items()} for pool, leg_rows in zip(new_pools, rows)]
+        sub_indices, sub_totals = enumerate_combinations(strategy, sub_pools, criteria)
+        if len(sub_indices):
+            found.append(np.column_stack([rows[l][sub_indices[:, l]] for l in range(n_legs)]))
+            found_totals.append(sub_totals)
+    new_indices = np.concatenate(found) if found else np.empty((0, n_legs), dtype=int)
+    new_totals = {key: np.concatenate([totals[key] for totals in found_totals]) if found_totals else np.empty(0)
+                  for key in ('net_cost', 'net_delta', 'net_vega')}
+    return kept, mapped[kept], new_indices, new_totals
+
+
+def merge_combination_order(pools, kept_indices, new_indices):
+    """
+    Order of the rows of [kept_indices; new_indices] in leg-major order (first leg outermost),
+    i.e. the order enumerate_combinations returns them in. Kept combinations normally are in
+    that order already, so the few new ones are sorted and merged in.
+    """
+    n_kept = len(kept_indices)
+    if n_kept + len(new_indices) == 0:
+        return np.empty(0, dtype=int)
+    shape = tuple(len(pool['strike']) for pool in pools)
+    kept_keys = np.ravel_multi_index(tuple(kept_indices.T), shape) if n_kept else np.empty(0, dtype=np.int64)
+    new_keys = np.ravel_multi_index(tuple(new_indices.T), shape) if len(new_indices) else np.empty(0, dtype=np.int64)
+    if np.any(np.diff(kept_keys) <= 0):
+        return np.argsort(np.concatenate([kept_keys, new_keys]), kind='stable')
+    new_order = np.argsort(new_keys, kind='stable')
+    new_positions = np.searchsorted(kept_keys, new_keys[new_order]) + np.arange(len(new_keys))
+    order = np.empty(n_kept + len(new_keys), dtype=int)
+    is_new = np.zeros(len(order), dtype=bool)
+    is_new[new_positions] = True
+    order[new_positions] = n_kept + new_order
+    order[~is_new] = np.arange(n_kept)
+    return order
+
+
+# -------------------------------
+# Shared Ranking Core
+# -------------------------------
+def safe_normalize(series, reverse=False):
+    if series.std() == 0 or len(series) < 2: return pd.Series([0.5] * len(series), index=series.index)
+    norm = (series - series.min()) / (series.max() - series.min())
+    return 1 - norm if reverse else norm
+
+
+def _normalization_bounds(series):
+    """The (min, max) safe_normalize scales `series` by, or None when it scores every row 0.5."""
+    if series.std() == 0 or len(series) < 2: return None
+    return series.min(), series.max()
+
+
+def rank_candidates(df, strategy, weights=None, previous=None, reused=None):
+    """
+    Add the normalized score columns and total_score to `df` and sort by it, best first.
+
+    Re-ranking after a refresh passes `previous`, the ranking_state() of the last ranking, and
+    `reused`: per row of `df`, its position in that ranking's frame when the row is unchanged,
+    else -1. A score whose min and max did not move keeps the previous values of reused rows
+    and only normalizes the others; a moved bound rescales every row, so that score column is
+    recomputed in full. Either way the result is identical to ranking from scratch.
+    """
+    weights = strategy['weights'] if weights is None else weights
+    if previous is not None and previous['weights'] != dict(weights):
+        previous = None
+    fresh = reused < 0 if previous is not None else None
+    all_reused = fresh is not None
+    for score_name, metric, use_abs, reverse in strategy['scores']:
+        values = df[metric].abs() if use_abs else df[metric]
+        column = f'{score_name}_score'
+        bounds = _normalization_bounds(values) if fresh is not None else None
+        if bounds is not None and bounds == previous['bounds'].get(column):
+            score = np.empty(len(values))
+            score[~fresh] = previous['scores'][column][reused[~fresh]]
+            norm = (values.to_numpy()[fresh] - bounds[0]) / (bounds[1] - bounds[0])
+            score[fresh] = 1 - norm if reverse else norm
+            df[column] = score
+        else:
+            df[column] = safe_normalize(values, reverse=reverse)
+            all_reused = False
+    if all_reused:
+        total_score = np.empty(len(df))
+        total_score[~fresh] = previous['total'][reused[~fresh]]
+        fresh_total = None
+        for score_name, weight in weights.items():
+            term = df[f'{score_name}_score'].to_numpy()[fresh] * weight
+            fresh_total = term if fresh_total is None else fresh_total + term
+        total_score[fresh] = fresh_total
+    else:
+        total_score = None
+        for score_name, weight in weights.items():
+            term = df[f'{score_name}_score'] * weight
+            total_score = term if total_score is None else total_score + term
+    df['total_score'] = total_score
+    return df.sort_values('total_score', ascending=False)
+
+
+def top_per_expiration(ranked, per_expiration=3):
+    """The best `per_expiration` rows of each expiration of a rank_candidates() frame, best first."""
+    return ranked.groupby('expiration').head(per_expiration).sort_values('total_score', ascending=False)
+
+
+def ranking_state(ranked, strategy, weights=None):
+    """
+    What rank_candidates(previous=...) needs from a ranking: the weights, each score's
+    normalization bounds, and the scores by row position of the frame that was ranked
+    (the index of `ranked`, which must have been a RangeIndex before sorting).
+    """
+    positions = ranked.index.to_numpy()
+    state = {'weights': dict(strategy['weights'] if weights is None else weights), 'bounds': {}, 'scores': {}}
+    for score_name, metric, use_abs, reverse in strategy['scores']:
+        column = f'{score_name}_score'
+        values = ranked[metric].abs() if use_abs else ranked[metric]
+        state['bounds'][column] = _normalization_bounds(values)
+        state['scores'][column] = np.empty(len(ranked))
+        state['scores'][column][positions] = ranked[column].to_numpy()
+    state['total'] = np.empty(len(ranked))
+    state['total'][positions] = ranked['total_score'].to_numpy()
+    return state
+
+
+def leg_payoffs(strategy, leg_strikes, settlement_price):
+    """Expiry value per share of all option legs, given each leg's strike array."""
+    payoff = 0.0
+    for leg in strategy['legs']:
+        strikes = leg_strikes[leg['name']]
+        intrinsic = (np.maximum(settlement_price - strikes, 0) if leg['type'] == 'call'
+                     else np.maximum(strikes - settlement_price, 0))
+        payoff = payoff + leg['side'] * leg.get('quantity', 1) * intrinsic
+    return payoff
@@ -0,0 +1,81 @@
+"""
+DataClient against a local stub server: its requests go through one pooled keep-alive
+session, and the connection reuse metrics count them.
+
+    python -m unittest test_data_client
+"""
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from data_client import DataClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keeps the connection open between requests
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProvider:
+    def Ticker(self, symbol, session=None):
+        return object()
+
+
+class DataClientPoolingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/v7/finance/options/TEST'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.client = DataClient(StubProvider())
+        self.addCleanup(self.client.close)
+
+    def test_requests_reuse_one_connection(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        http = self.client.stats()['http']
+        self.assertEqual(http['requests'], 5)
+        self.assertEqual(http['connections_opened'], 1)
+        self.assertEqual(http['connections_reused'], 4)
+
+    def test_reuse_grows_with_each_request(self):
+        self.client.get(self.url)
+        before = self.client.stats()['http']['connections_reused']
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(self.client.stats()['http']['connections_reused'], before + 2)
+
+    def test_reset_starts_a_new_session(self):
+        self.client.get(self.url)
+        self.client.reset()
+        self.client.get(self.url)
+        http = self.client.stats()['http']
+        self.assertEqual((http['requests'], http['connections_opened']), (1, 1))
+
+    def test_ticker_handles_are_cached(self):
+        first = self.client.ticker('aapl')
+        self.assertIs(self.client.ticker('AAPL'), first)
+        self.assertIsNot(self.client.ticker('AAPL', fresh=True), first)
+        handles = self.client.stats()['ticker_handles']
+        self.assertEqual((handles['hits'], handles['misses']), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
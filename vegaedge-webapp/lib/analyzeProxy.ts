@@ -0,0 +1,165 @@
+import http from 'node:http';
+import https from 'node:https';
+import type { NextApiRequest, NextApiResponse } from 'next';
+
+// Replace with your actual Render backend URL
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000';
+
+// Identical analyses within this window are answered from memory
+const CACHE_TTL_MS = Number(process.env.ANALYZE_CACHE_TTL_MS ?? 30_000);
+const CACHE_MAX_ENTRIES = Number(process.env.ANALYZE_CACHE_MAX_ENTRIES ?? 500);
+const BACKEND_TIMEOUT_MS = Number(process.env.BACKEND_TIMEOUT_MS ?? 120_000);
+
+// Keep-alive connections to the backend, reused across requests
+const agentOptions = { keepAlive: true, maxSockets: 32, maxFreeSockets: 8 };
+const httpAgent = new http.Agent(agentOptions);
+const httpsAgent = new https.Agent(agentOptions);
+
+type BackendResponse = {
+  status: number;
+  body: string;
+  retryAfter?: string;
+};
+
+type CacheStatus = 'HIT' | 'MISS' | 'COALESCED';
+
+// Per server process (each serverless instance has its own)
+const cache = new Map<string, { expiresAt: number; response: BackendResponse }>();
+const inFlight = new Map<string, Promise<BackendResponse>>();
+
+function postJson(path: string, payload: unknown): Promise<BackendResponse> {
+  const url = new URL(`${BACKEND_URL}${path}`);
+  const body = JSON.stringify(payload);
+  const client = url.protocol === 'https:' ? https : http;
+  return new Promise((resolve, reject) => {
+    const request = client.request(
+      url,
+      {
+        method: 'POST',
+        agent: url.protocol === 'https:' ? httpsAgent : httpAgent,
+        headers: {
+          'Content-Type': 'application/json',
+          'Content-Length': Buffer.byteLength(body),
+        },
+        timeout: BACKEND_TIMEOUT_MS,
+      },
+      (response) => {
+        const chunks: Buffer[] = [];
+        response.on('data', (chunk: Buffer) => chunks.push(chunk));
+        response.on('end', () => {
+          const retryAfter = response.headers['retry-after'];
+          resolve({
+            status: response.statusCode ?? 502,
+            body: Buffer.concat(chunks).toString('utf8'),
+            retryAfter: Array.isArray(retryAfter) ? retryAfter[0] : retryAfter,
+          });
+        });
+        response.on('error', reject);
+      }
+    );
+    request.on('timeout', () => request.destroy(new Error('Backend request timed out')));
+    request.on('error', reject);
+    request.end(body);
+  });
+}
+
+function cached(key: string): BackendResponse | undefined {
+  const entry = cache.get(key);
+  if (!entry) return undefined;
+  if (entry.expiresAt <= Date.now()) {
+    cache.delete(key);
+    return undefined;
+  }
+  // Move to the back so the Map's insertion order stays least recently used first
+  cache.delete(key);
+  cache.set(key, entry);
+  return entry.response;
+}
+
+/**
+ * Whether a backend response is a completed analysis worth caching. The backend answers
+ * failed analyses with 200 too, but with an "Analysis Error" summary and no analysis_id.
+ */
+function isCacheable(response: BackendResponse): boolean {
+  if (response.status !== 200) return false;
+  try {
+    const data = JSON.parse(response.body);
+    const summary = data?.result?.summary;
+    return Boolean(data?.analysis_id) && !(typeof summary === 'string' && summary.startsWith('Analysis Error'));
+  } catch {
+    return false;
+  }
+}
+
+function store(key: string, response: BackendResponse) {
+  if (CACHE_TTL_MS <= 0) return;
+  cache.set(key, { expiresAt: Date.now() + CACHE_TTL_MS, response });
+  while (cache.size > CACHE_MAX_ENTRIES) {
+    cache.delete(cache.keys().next().value as string);
+  }
+}
+
+/**
+ * Backend response for one analysis, with how it was obtained: from the cache (HIT), by
+ * joining an identical request already in flight (COALESCED) or from the backend (MISS).
+ * Only completed analyses are cached (see isCacheable).
+ */
+export async function analyze(
+  strategy: string,
+  params: { ticker: string; min_dte: number; max_dte: number }
+): Promise<{ response: BackendResponse; cacheStatus: CacheStatus }> {
+  const key = [strategy, String(params.ticker).trim().toUpperCase(), params.min_dte, params.max_dte].join(':');
+  const hit = cached(key);
+  if (hit) return { response: hit, cacheStatus: 'HIT' };
+
+  const pending = inFlight.get(key);
+  if (pending) return { response: await pending, cacheStatus: 'COALESCED' };
+
+  const request = postJson(`/analyze/${strategy}`, params)
+    .then((response) => {
+      if (isCacheable(response)) store(key, response);
+      return response;
+    })
+    .finally(() => inFlight.delete(key));
+  inFlight.set(key, request);
+  return { response: await request, cacheStatus: 'MISS' };
+}
+
+/** API route handler forwarding POSTs to the backend's /analyze/{strategy} endpoint. */
+export function analyzeHandler(strategy: string) {
+  return async function handler(req: NextApiRequest, res: NextApiResponse) {
+    if (req.method !== 'POST') {
+      return res.status(405).json({ error: 'Method not allowed' });
+    }
+
+    try {
+      const { ticker, min_dte, max_dte } = req.body;
+
+      // Validate input
+      if (!ticker || !min_dte || !max_dte) {
+        return res.status(400).json({ error: 'Missing required parameters' });
+      }
+
+      const { response, cacheStatus } = await analyze(strategy, { ticker, min_dte, max_dte });
+      res.setHeader('X-Cache', cacheStatus);
+
+      if (response.status !== 200) {
+        console.error('Backend error:', response.body);
+        if (response.retryAfter) res.setHeader('Retry-After', response.retryAfter);
+        return res.status(response.status).json({
+          error: `Backend error: ${response.status}`
+        });
+      }
+
+      // The backend's JSON is passed through as is, without parsing it again
+      res.setHeader('Content-Type', 'application/json; charset=utf-8');
+      res.status(200).send(response.body);
+    } catch (error) {
+      console.error('API error:', error);
+      res.status(500).json({
+        error: 'Internal server error',
+        details: error instanceof Error ? error.message : 'Unknown error'
+      });
+    }
+  };
+}